@@ -0,0 +1,128 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_KEY = 'auth-token:{}'
+
+
+class TokenCache:
+    """
+    Кеш 'ключ токена -> (пользователь, токен)' в памяти воркера.
+    Записи живут 'timeout' секунд, при переполнении вытесняются
+    самые старые.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, credentials = entry
+        if expires < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return credentials
+
+    def set(self, key, credentials, timeout, max_size):
+        with self._lock:
+            self._entries.pop(key, None)
+            while self._entries and len(self._entries) >= max_size:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + timeout, credentials)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_tokens = TokenCache()
+
+
+def get_cached_credentials(key):
+    """
+    Пара (пользователь, токен) из памяти воркера, затем из общего кеша.
+    Возвращается копия: объекты из кеша не меняются запросами.
+    """
+
+    credentials = _tokens.get(key)
+    if credentials is None and settings.TOKEN_CACHE_SHARED:
+        credentials = cache.get(TOKEN_KEY.format(key))
+        if credentials is not None:
+            _tokens.set(
+                key,
+                credentials,
+                settings.TOKEN_CACHE_TIMEOUT,
+                settings.TOKEN_CACHE_SIZE
+            )
+    return copy.deepcopy(credentials)
+
+
+def set_cached_credentials(key, credentials):
+    _tokens.set(
+        key,
+        credentials,
+        settings.TOKEN_CACHE_TIMEOUT,
+        settings.TOKEN_CACHE_SIZE
+    )
+    if settings.TOKEN_CACHE_SHARED:
+        cache.set(
+            TOKEN_KEY.format(key),
+            credentials,
+            settings.TOKEN_CACHE_SHARED_TIMEOUT
+        )
+
+
+def invalidate_tokens(keys):
+    """
+    Сбрасывает закешированные токены 'keys' сейчас и после коммита:
+    иначе параллельный запрос успеет закешировать старые данные.
+    Память других воркеров очищается по истечении TOKEN_CACHE_TIMEOUT.
+    """
+
+    def delete():
+        for key in keys:
+            _tokens.delete(key)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete_many([TOKEN_KEY.format(key) for key in keys])
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        list(Token.objects.filter(user_id=user_id).values_list(
+            'key', flat=True
+        ))
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса Token + User к БД на каждый запрос:
+    найденная пара (пользователь, токен) кешируется по ключу токена.
+    Неверные токены и неактивные пользователи не кешируются.
+    Кеш сбрасывается при выходе (удалении токена), деактивации
+    пользователя и смене пароля (см. api.signals).
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE:
+            return super().authenticate_credentials(key)
+
+        credentials = get_cached_credentials(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            set_cached_credentials(key, credentials)
+        return credentials
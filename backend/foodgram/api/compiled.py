@@ -0,0 +1,191 @@
+from django.conf import settings
+
+from recipes.images import get_variant_urls
+from .metrics import TimedSerializer
+from .serializers import RecipesSerializer, SubscribeSerializer
+from .simple_serializers import TagsSerializer
+from .utils import attach_limited_recipes
+
+# Флаги рецепта и множества id из контекста 'membership' (Membership).
+MEMBERSHIP_FIELDS = (
+    ('is_favorited', 'favorites'),
+    ('is_in_shopping_cart', 'cart'),
+)
+
+
+def image_url(field_file):
+    """Как Base64toImageFile: относительная ссылка или None."""
+
+    return field_file.url if field_file else None
+
+
+def get_is_subscribed(user, context, is_subscribed=None):
+    """Как CustomUsersSerializer.get_is_subscribed."""
+
+    if is_subscribed is None:
+        is_subscribed = getattr(user, 'is_subscribed', None)
+    if is_subscribed is not None:
+        return is_subscribed
+    current = context['request'].user
+    return (current.is_authenticated
+            and user.subscribers.filter(user=current).exists())
+
+
+class CompiledSerializer:
+    """
+    Сериализатор только на чтение для list/retrieve без дерева полей DRF.
+    Словари собираются напрямую из атрибутов объектов и заранее
+    подгруженных связей, поэтому вывод должен совпадать с обычным
+    сериализатором из 'parity' байт в байт
+    (проверка - тесты api.tests и manage.py check_serializers).
+    """
+
+    parity = None
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    def to_representation(self, instance):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(obj) for obj in self.instance]
+        return self.to_representation(self.instance)
+
+
+class CompiledTagsSerializer(CompiledSerializer):
+    """Поля и порядок - как у TagsSerializer."""
+
+    parity = TagsSerializer
+
+    def to_representation(self, tag):
+        return {
+            'id': tag.id,
+            'name': tag.name,
+            'color': tag.color,
+            'slug': tag.slug,
+        }
+
+
+class CompiledRecipesSerializer(CompiledSerializer):
+    """
+    Вывод RecipesSerializer. Теги - вложенные depth=1, то есть
+    все поля модели в порядке объявления: id, name, slug, color.
+    """
+
+    parity = RecipesSerializer
+
+    def get_author(self, recipe):
+        author = recipe.author
+        return {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': get_is_subscribed(
+                author,
+                self.context,
+                getattr(recipe, 'author_is_subscribed', None)
+            ),
+        }
+
+    def to_representation(self, recipe):
+        image = recipe.image
+        data = {
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': image_url(image),
+            'images': get_variant_urls(image),
+            'image_status': recipe.image_status,
+            'tags': [
+                {
+                    'id': tag.id,
+                    'name': tag.name,
+                    'slug': tag.slug,
+                    'color': tag.color,
+                }
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'id': item.ingredient.id,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': float(item.amount),
+                }
+                for item in recipe.recipe_ingredients.all()
+            ],
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': self.get_author(recipe),
+        }
+
+        # Как MembershipField: аннотация, иначе кеш, иначе поля нет.
+        membership = self.context.get('membership')
+        for field, kind in MEMBERSHIP_FIELDS:
+            if hasattr(recipe, field):
+                data[field] = bool(getattr(recipe, field))
+            elif membership is not None:
+                data[field] = recipe.id in getattr(membership, kind)
+        return data
+
+
+class CompiledSubscribeSerializer(CompiledSerializer):
+    """Вывод SubscribeSerializer с краткими рецептами автора."""
+
+    parity = SubscribeSerializer
+
+    def to_representation(self, author):
+        if not hasattr(author, 'limited_recipes'):
+            attach_limited_recipes([author], self.context['request'])
+        return {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': get_is_subscribed(author, self.context),
+            'recipes': [
+                {
+                    'id': recipe.id,
+                    'name': recipe.name,
+                    'image': image_url(recipe.image),
+                    'cooking_time': recipe.cooking_time,
+                }
+                for recipe in author.limited_recipes
+            ],
+            'recipes_count': author.recipes_count,
+        }
+
+
+class CompiledSerializerMixin:
+    """
+    Для list/retrieve в JSON подставляет 'compiled_serializer_class'
+    вместо обычного сериализатора. Остальные действия и браузерная
+    версия API работают через DRF как раньше.
+    Сериализатор любого действия оборачивается в TimedSerializer.
+    """
+
+    compiled_serializer_class = None
+
+    def use_compiled_serializer(self):
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return (settings.COMPILED_SERIALIZERS
+                and self.compiled_serializer_class is not None
+                and self.action in ('list', 'retrieve')
+                and renderer is not None
+                and renderer.format == 'json')
+
+    def get_serializer(self, *args, **kwargs):
+        if self.use_compiled_serializer():
+            kwargs['context'] = self.get_serializer_context()
+            serializer = self.compiled_serializer_class(*args, **kwargs)
+        else:
+            serializer = super().get_serializer(*args, **kwargs)
+        # Время сериализации - в метрики запроса.
+        return TimedSerializer(serializer, self.request._request)
@@ -1,20 +1,37 @@
 import django_filters
-from rest_framework.filters import SearchFilter
+from django.conf import settings
+from rest_framework.filters import BaseFilterBackend
 
+from recipes.fulltext import search_recipes
+from recipes.membership import get_membership
 from recipes.models import Recipe
+from recipes.search import ingredient_index
 
 
-class IngredientSearchFilter(SearchFilter):
-    """Фильтр для ингредиентов с переопределенным именем параметра запроса."""
+class IngredientSearchFilter(BaseFilterBackend):
+    """
+    Поиск ингредиентов по началу названия для автодополнения.
+    Поиск идет по индексу в памяти процесса, без запросов в БД.
+    """
 
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name or getattr(view, 'action', None) != 'list':
+            return queryset
+        return ingredient_index.search(name)
+
 
 class RecipeFilter(django_filters.FilterSet):
     """
     Кастомный фильтр для вьюсета 'Recipe'.
     Параметры 'is_favorited' и 'is_in_shopping_cart' для удобства
     будут задаваться в строке запроса 1 и 0 вместо True/False.
+    Параметр 'search' - полнотекстовый поиск по названию и описанию
+    (слова ищутся по префиксу), результаты сортируются по релевантности.
+    В курсорном режиме (параметры 'sort' или 'cursor') порядок задает
+    курсорная пагинация, и релевантность не учитывается.
     """
 
     CHOICES = (('1', True), ('0', False))
@@ -22,13 +39,40 @@ class RecipeFilter(django_filters.FilterSet):
     author = django_filters.CharFilter(field_name='author__id')
     is_favorited = django_filters.ChoiceFilter(
         choices=CHOICES,
-        field_name='is_favorited'
+        method='filter_membership'
     )
     is_in_shopping_cart = django_filters.ChoiceFilter(
         choices=CHOICES,
-        field_name='is_in_shopping_cart'
+        method='filter_membership'
     )
 
+    search = django_filters.CharFilter(method='filter_search')
+
+    # Параметр фильтра -> множество id рецептов из кеша.
+    MEMBERSHIP_KINDS = {
+        'is_favorited': 'favorites',
+        'is_in_shopping_cart': 'cart',
+    }
+
+    def filter_membership(self, queryset, name, value):
+        """
+        С кешем (MEMBERSHIP_CACHE) фильтр превращается в 'id__in'
+        по множеству id рецептов пользователя, без него -
+        в условие по аннотации из RecipeQuerySet.annotated().
+        """
+
+        if not settings.MEMBERSHIP_CACHE:
+            return queryset.filter(**{name: value == '1'})
+        recipe_ids = getattr(
+            get_membership(self.request.user), self.MEMBERSHIP_KINDS[name]
+        )
+        if value == '1':
+            return queryset.filter(id__in=recipe_ids)
+        return queryset.exclude(id__in=recipe_ids)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
-        fields = ('author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'is_favorited', 'is_in_shopping_cart', 'search')
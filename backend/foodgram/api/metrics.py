@@ -0,0 +1,141 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Границы корзин гистограмм (Prometheus 'le').
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Метрика -> (описание, корзины).
+METRICS = {
+    'foodgram_request_duration_seconds': (
+        'Total request time', SECONDS_BUCKETS
+    ),
+    'foodgram_request_db_duration_seconds': (
+        'Time spent in SQL per request', SECONDS_BUCKETS
+    ),
+    'foodgram_request_serialize_duration_seconds': (
+        'Time spent building serializer data per request', SECONDS_BUCKETS
+    ),
+    'foodgram_request_render_duration_seconds': (
+        'Time spent encoding the response (renderer) per request',
+        SECONDS_BUCKETS
+    ),
+    'foodgram_request_db_queries': (
+        'SQL queries per request', QUERIES_BUCKETS
+    ),
+}
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: счетчики по корзинам и сумма."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    Гистограммы запросов по представлениям в памяти процесса.
+    При нескольких воркерах у каждого своя копия - Prometheus
+    должен опрашивать воркеры по отдельности.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)
+
+    def observe(self, view, method, values):
+        """'values' - {имя метрики из METRICS: значение}."""
+
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms[name].get((view, method))
+                if histogram is None:
+                    histogram = Histogram(METRICS[name][1])
+                    self._histograms[name][(view, method)] = histogram
+                histogram.observe(value)
+
+    def render(self):
+        """Текстовый формат Prometheus (exposition format 0.0.4)."""
+
+        lines = []
+        with self._lock:
+            for name, (description, _) in METRICS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, method), histogram in sorted(
+                        self._histograms[name].items()):
+                    labels = f'view="{view}",method="{method}"'
+                    lines.extend(histogram.lines(name, labels))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class TimedSerializer:
+    """
+    Обертка сериализатора для метрик: время построения '.data'
+    (обход полей и to_representation - основная работа сериализации,
+    она идет внутри представления) прибавляется к 'serialize_duration'
+    запроса 'request' (django HttpRequest).
+    Остальные атрибуты и методы - от самого сериализатора.
+    """
+
+    def __init__(self, serializer, request):
+        self._serializer = serializer
+        self._request = request
+
+    def __getattr__(self, name):
+        return getattr(self._serializer, name)
+
+    @property
+    def data(self):
+        start = perf_counter()
+        try:
+            return self._serializer.data
+        finally:
+            self._request.serialize_duration = (
+                getattr(self._request, 'serialize_duration', 0)
+                + perf_counter() - start
+            )
+
+
+def metrics_view(request):
+    """
+    Внутренний эндпоинт для Prometheus.
+    Доступен только с адресов из настройки METRICS_ALLOWED_IPS.
+    За nginx REMOTE_ADDR - всегда адрес nginx, поэтому снаружи
+    /api/metrics/ закрыт в infra/nginx.conf, а Prometheus опрашивает
+    web:8000 напрямую из сети docker.
+    """
+
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
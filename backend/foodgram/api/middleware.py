@@ -0,0 +1,143 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from recipes.replicas import pin_to_primary
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """
+    Обертка для connection.execute_wrapper: считает запросы
+    и время SQL, медленные запросы пишет в лог.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                logger.warning(
+                    'Slow query (%.1f ms, %s): %s',
+                    duration * 1000, context['connection'].alias, sql[:1000]
+                )
+
+
+def get_view_name(view_func, method):
+    """
+    Имя представления для метрик: 'RecipesViewSet.list',
+    'DownloadShoppingCart.get' или имя функции.
+    """
+
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    handler = actions.get(method, method)
+    return f'{view_class.__name__}.{handler}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеры для каждого запроса: число SQL-запросов и их время,
+    время сериализации (построение '.data' внутри представления,
+    см. TimedSerializer), время рендеринга ответа в байты и общее время.
+    Замеры отдаются в заголовке Server-Timing, попадают
+    в гистограммы для /api/metrics/, медленные запросы пишутся в лог.
+    Должен стоять первым в MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = 'unresolved'
+        request.serialize_duration = 0
+        request.render_duration = 0
+        timer = QueryTimer()
+        start = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        total = perf_counter() - start
+
+        method = request.method.lower()
+        registry.observe(request.metrics_view, method, {
+            'foodgram_request_duration_seconds': total,
+            'foodgram_request_db_duration_seconds': timer.duration,
+            'foodgram_request_serialize_duration_seconds': (
+                request.serialize_duration
+            ),
+            'foodgram_request_render_duration_seconds': (
+                request.render_duration
+            ),
+            'foodgram_request_db_queries': timer.count,
+        })
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timer.duration * 1000:.1f}'
+            f';desc="{timer.count} queries"',
+            f'serialize;dur={request.serialize_duration * 1000:.1f}',
+            f'render;dur={request.render_duration * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %s queries, %.1f ms SQL',
+                request.method, request.path, request.metrics_view,
+                total * 1000, timer.count, timer.duration * 1000
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = get_view_name(
+            view_func, request.method.lower()
+        )
+
+    def process_template_response(self, request, response):
+        """
+        Ответы DRF рендерятся после выхода из представления:
+        время рендеринга - от этой точки до post-render callback.
+        """
+
+        render_start = perf_counter()
+
+        def rendered(response):
+            request.render_duration = perf_counter() - render_start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReadYourWritesMiddleware:
+    """
+    После запроса на запись (POST, PATCH, DELETE...) пользователь
+    DB_REPLICA_LAG секунд читает с основной БД, а не с реплик,
+    и сразу видит свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS
+                and user is not None
+                and user.is_authenticated):
+            pin_to_primary(user.id)
+        return response
@@ -1,6 +1,252 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import get_feed_ids
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу (sort_key, id).
+    Следующая страница выбирается условием '(sort_key, id) > (k, i)'
+    (см. filter_after), без OFFSET и COUNT(*),
+    поэтому стоимость страницы не зависит от ее номера.
+    Режимы сортировки - словарь 'sorts': {'имя': ('поле', по убыванию)},
+    под каждый режим в модели должен быть индекс (поле, id).
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    sort_query_param = 'sort'
+    sorts = {}
+    default_sort = None
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        # Как _positive_int в DRF: isnumeric() пропускает, например, '½'.
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 0:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return cursor['s'], cursor['k'], cursor['i'], cursor['r']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        field, _ = self.sorts[self.sort]
+        cursor = {
+            's': self.sort,
+            'k': getattr(obj, field),
+            'i': obj.id,
+            'r': reverse,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode())
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode()
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.sort = request.query_params.get(
+            self.sort_query_param, self.default_sort
+        )
+        if self.sort not in self.sorts:
+            raise ValidationError(
+                {self.sort_query_param: f'Доступные значения: '
+                                        f'{", ".join(self.sorts)}.'}
+            )
+        field, descending = self.sorts[self.sort]
+        cursor = self.decode_cursor(request)
+        reverse = False
+        key = None
+
+        if cursor is not None:
+            sort, key, last_id, reverse = cursor
+            if sort != self.sort:
+                raise NotFound('Курсор не соответствует сортировке.')
+            key = self.parse_key(queryset, field, key, last_id, reverse)
+
+        # Идем вперед по возрастанию ключа либо назад по убыванию.
+        ascending = descending == reverse
+        page_size = self.get_page_size(request)
+        results = self.get_rows(queryset, field, ascending, key, page_size + 1)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def parse_key(self, queryset, field, key, last_id, reverse):
+        """
+        Ключ из курсора, приведенный к типу поля сортировки.
+        Курсор приходит от клиента: при неверных типах - NotFound,
+        а не ошибка в запросе к БД.
+        """
+
+        if (not isinstance(last_id, int) or isinstance(last_id, bool)
+                or not isinstance(reverse, bool) or key is None):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            key = queryset.model._meta.get_field(field).to_python(key)
+        except DjangoValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return key, last_id
+
+    def get_rows(self, queryset, field, ascending, key, limit):
+        """
+        Первые 'limit' строк после ключа 'key' ((значение поля, id)
+        или None) в порядке возрастания либо убывания.
+        """
+
+        lookup = 'gt' if ascending else 'lt'
+        if key is not None:
+            value, last_id = key
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{lookup}': last_id})
+            else:
+                queryset = self.filter_after(
+                    queryset, field, lookup, value, last_id
+                )
+
+        prefix = '' if ascending else '-'
+        ordering = (f'{prefix}{field}', ) if field == 'id' else (
+            f'{prefix}{field}', f'{prefix}id'
+        )
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def filter_after(self, queryset, field, lookup, value, last_id):
+        """
+        Условие '(field, id) > (value, last_id)' (или '<').
+        В PostgreSQL - сравнение строк, которое идет по индексу
+        (field, id) как диапазон. В остальных БД - OR из двух условий
+        с лишним 'field >= value', чтобы индекс использовался хотя бы
+        по первому полю.
+        """
+
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            quote = connection.ops.quote_name
+            table = quote(queryset.model._meta.db_table)
+            column = quote(queryset.model._meta.get_field(field).column)
+            operator = '>' if lookup == 'gt' else '<'
+            return queryset.extra(
+                where=[f'({table}.{column}, {table}.{quote("id")}) '
+                       f'{operator} (%s, %s)'],
+                params=[value, last_id]
+            )
+        return queryset.filter(
+            Q(**{f'{field}__{lookup}e': value}),
+            Q(**{f'{field}__{lookup}': value})
+            | Q(**{field: value, f'id__{lookup}': last_id})
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class RecipeCursorPagination(KeysetPagination):
+    sorts = {
+        'newest': ('id', True),
+        'name': ('name', False),
+        'cooking_time': ('cooking_time', False),
+    }
+    default_sort = 'newest'
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Лента подписок - только новые рецепты сверху.
+    Страница id берется из recipes.feed.get_feed_ids,
+    а 'queryset' только загружает рецепты по этим id.
+    """
+
+    sorts = {
+        'newest': ('id', True),
+    }
+    default_sort = 'newest'
+
+    def get_rows(self, queryset, field, ascending, key, limit):
+        recipe_ids = get_feed_ids(
+            self.request.user,
+            limit,
+            cursor=key[1] if key is not None else None,
+            descending=not ascending
+        )
+        recipes = queryset.in_bulk(recipe_ids)
+        return [recipes[pk] for pk in recipe_ids if pk in recipes]
+
+
+class RecipePagination(CustomPagination):
+    """
+    Постраничная пагинация рецептов, как и раньше.
+    Если в запросе есть параметр 'sort' или 'cursor',
+    используется курсорная пагинация RecipeCursorPagination.
+    Она сортирует по своему ключу, поэтому сортировка результатов
+    поиска ('search') по релевантности в этом режиме заменяется им.
+    """
+
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_params = (
+            self.cursor_pagination_class.sort_query_param,
+            self.cursor_pagination_class.cursor_query_param
+        )
+        if any(param in request.query_params for param in cursor_params):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,34 @@
+import hashlib
+
+from django.utils.http import urlencode
+
+from recipes.search import INGREDIENTS_VERSION
+from recipes.tags import TAGS_VERSION
+from recipes.versions import RECIPES_VERSION, get_version
+
+RESPONSE_KEY = 'response:{}'
+
+# Версии данных, из которых собираются ответы о рецептах.
+RESPONSE_VERSIONS = (RECIPES_VERSION, TAGS_VERSION, INGREDIENTS_VERSION)
+
+
+def get_cache_key(request):
+    """
+    Ключ кеша ответа: версии данных, адрес и параметры запроса.
+    Параметры нормализуются - порядок ключей и повторяющихся
+    значений (например, 'tags') на ключ не влияет.
+    """
+
+    params = urlencode(
+        sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        ),
+        doseq=True
+    )
+    versions = '-'.join(
+        str(get_version(name)) for name in RESPONSE_VERSIONS
+    )
+    url = request.build_absolute_uri(request.path)
+    raw_key = f'{versions}:{url}?{params}'
+    return RESPONSE_KEY.format(hashlib.md5(raw_key.encode()).hexdigest())
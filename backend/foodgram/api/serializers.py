@@ -1,17 +1,19 @@
-import base64
 import re
-import time as t
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
-from django.utils.text import slugify
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
+from recipes.images import get_variant_urls
+from recipes.jobs import enqueue_image
 from recipes.models import Recipe, RecipeIngredients, Tag
+from recipes.shopping_list import track_recipe_ingredients
 from .simple_serializers import (IngredientDetailSerializer,
                                  IngredientsToWrite,
                                  RecipesShortInfoSerializer)
+from .utils import attach_limited_recipes
 
 User = get_user_model()
 
@@ -25,8 +27,14 @@ class CustomUsersSerializer(UserSerializer):
         """
         Добавляет поле с результатом проверки,
         подписан ли текущий юзер на просматриваемого автора.
+        Если результат уже посчитан в queryset'е (атрибут 'is_subscribed'),
+        повторный запрос в БД не выполняется.
         """
 
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+
         user = self.context.get('request').user
         return (user.is_authenticated
                 and obj.subscribers.filter(user=user).exists())
@@ -60,35 +68,52 @@ class CustomUsersCreateSerializer(UserCreateSerializer):
 class Base64toImageFile(serializers.ImageField):
     """
     Обработка данных из поля image с последующим сохранением изображения в БД.
-    При записи в поле поступает байтовая строка, которая декодируется в
-    изображение и сохраняется. При просмотре возвращается url изображения.
+    При записи в поле поступает байтовая строка, которая ставится в очередь
+    фоновой обработки. При просмотре возвращается url изображения.
     """
 
-    pattern = (
-        r'data:(?P<f_dir>\w+)\/(?P<f_ext>\w+);base64,(?P<byte_string>.+)'
-    )
+    pattern = re.compile(r'^data:image/(?P<f_ext>\w+);base64$')
 
     def to_representation(self, value):
+        if not value:
+            # Картинка нового рецепта еще обрабатывается.
+            return None
         return value.url
 
     def to_internal_value(self, data):
         """
-        Имя изображения формируется из хеша временной метки и слага
-        названия рецепта - чтобы исключить перезапись изображений
-        рецептов с одинаковыми названиями.
+        В запросе проверяется только заголовок data URI и размер.
+        Декодирование, проверка Pillow и варианты картинки выполняются
+        в фоне (recipes.jobs), возвращается base64-строка для очереди.
         """
 
-        recipe_name = self.context['request'].data['name']
-        slugify_name = slugify(recipe_name, allow_unicode=True)
-        to_compile = re.compile(self.pattern)
-        parse = to_compile.search(data)
-        f_ext = parse.group('f_ext')
-        byte_string = parse.group('byte_string')
-        f_name = f'{hash(t.time())}-{slugify_name}.{f_ext}'
-        decoded_byte_string = base64.b64decode(byte_string)
+        if not isinstance(data, str):
+            self.fail('invalid')
+        header, _, byte_string = data.partition(',')
+        if not self.pattern.match(header) or not byte_string:
+            self.fail('invalid_image')
+        if len(byte_string) * 3 // 4 > settings.IMAGE_MAX_SIZE + 3:
+            raise serializers.ValidationError('Изображение слишком большое!')
+        return byte_string
+
+
+class MembershipField(serializers.BooleanField):
+    """
+    Флаг 'рецепт в избранном/корзине пользователя'.
+    Берется из аннотации queryset'а, а если ее нет - из множества id
+    рецептов 'kind' (favorites или cart) в контексте 'membership'.
+    """
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
-        image = ContentFile(decoded_byte_string, name=f_name)
-        return super(Base64toImageFile, self).to_internal_value(image)
+    def get_attribute(self, instance):
+        membership = self.context.get('membership')
+        if membership is None or hasattr(instance, self.source):
+            return super().get_attribute(instance)
+        return instance.id in getattr(membership, self.kind)
 
 
 class RecipesSerializer(serializers.ModelSerializer):
@@ -99,14 +124,30 @@ class RecipesSerializer(serializers.ModelSerializer):
         many=True
     )
     author = CustomUsersSerializer(read_only=True)
-    is_favorited = serializers.BooleanField(read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    is_favorited = MembershipField('favorites')
+    is_in_shopping_cart = MembershipField('cart')
     image = Base64toImageFile()
+    images = serializers.SerializerMethodField()
+
+    def get_images(self, obj):
+        """
+        Ссылки на уменьшенные копии: thumbnail, card, full.
+        Пока картинка обрабатывается, вариантов может еще не быть.
+        """
+
+        return get_variant_urls(obj.image)
+
+    def to_representation(self, instance):
+        # Подписка на автора посчитана в RecipeQuerySet.annotated().
+        author_is_subscribed = getattr(instance, 'author_is_subscribed', None)
+        if author_is_subscribed is not None:
+            instance.author.is_subscribed = author_is_subscribed
+        return super().to_representation(instance)
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'name', 'image', 'tags',
+            'id', 'name', 'image', 'images', 'image_status', 'tags',
             'ingredients', 'text',
             'cooking_time', 'author',
             'is_favorited', 'is_in_shopping_cart'
@@ -131,11 +172,16 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         return RecipesSerializer(instance, context=self.context).data
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(author=author, **validated_data)
+        image = validated_data.pop('image')
+        recipe = Recipe.objects.create(
+            author=author, image='', **validated_data
+        )
+        enqueue_image(recipe, image)
 
         recipe.tags.set(tags)
 
@@ -148,27 +194,33 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-
-        if validated_data.get('image') is not None:
-            instance.image.delete()
+        image = validated_data.pop('image', None)
 
         super().update(instance=instance, validated_data=validated_data)
 
+        # Старая картинка удаляется в фоне после обработки новой.
+        if image is not None:
+            enqueue_image(instance, image)
+
         instance.tags.set(tags)
 
-        # Сначала удаляем все старые связки рецепт-ингредиент-количество.
-        instance.recipe_ingredients.all().delete()
+        # Разница в составе попадет в списки покупок тех,
+        # у кого рецепт в корзине.
+        with track_recipe_ingredients([instance.id]):
+            # Сначала удаляем все старые связки рецепт-ингредиент-количество.
+            instance.recipe_ingredients.all().delete()
 
-        # Перезаписываем заново с новыми данными.
-        recipe_ingredients = [RecipeIngredients(
-            recipe=instance,
-            ingredient=ingredient['id'],
-            amount=ingredient['amount']
-        ) for ingredient in ingredients]
-        RecipeIngredients.objects.bulk_create(recipe_ingredients)
+            # Перезаписываем заново с новыми данными.
+            recipe_ingredients = [RecipeIngredients(
+                recipe=instance,
+                ingredient=ingredient['id'],
+                amount=ingredient['amount']
+            ) for ingredient in ingredients]
+            RecipeIngredients.objects.bulk_create(recipe_ingredients)
 
         return instance
 
@@ -188,22 +240,17 @@ class SubscribeSerializer(CustomUsersSerializer):
     recipes_count = serializers.IntegerField()
 
     def get_recipes(self, obj):
-        request = self.context['request']
-        recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-
-        if recipes_limit is None:
-            # Если параметр 'limit' отсутствует в запросе
-            # выводим все рецепты автора.
-            return RecipesShortInfoSerializer(recipes, many=True).data
-        elif not recipes_limit.isnumeric():
-            # Если параметр 'limit' не цифра, сообщаем об ошибке.
-            raise serializers.ValidationError(
-                'Проверьте значение параметра recipes_limit!'
-            )
-
-        recipes = obj.recipes.all()[:int(recipes_limit)]
-        return RecipesShortInfoSerializer(recipes, many=True).data
+        """
+        Рецепты автора подгружаются заранее для всей страницы
+        в 'attach_limited_recipes'.
+        """
+
+        if not hasattr(obj, 'limited_recipes'):
+            attach_limited_recipes([obj], self.context['request'])
+        return RecipesShortInfoSerializer(
+            obj.limited_recipes,
+            many=True
+        ).data
 
     class Meta:
         model = User
@@ -213,3 +260,13 @@ class SubscribeSerializer(CustomUsersSerializer):
             'is_subscribed', 'recipes',
             'recipes_count'
         )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_SIZE
+    )
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+from .authentication import invalidate_tokens, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    """Выход через djoser 'token/logout' удаляет токен пользователя."""
+
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, created, update_fields=None, **kwargs):
+    """
+    Деактивация, смена пароля и любые другие изменения пользователя
+    сбрасывают его закешированные токены.
+    Обновление одного 'last_login' при входе на токены не влияет.
+    """
+
+    if created:
+        return
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
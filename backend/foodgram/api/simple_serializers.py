@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingListItem, Tag)
 
 
 class IngredientsSerializer(serializers.ModelSerializer):
@@ -57,3 +58,20 @@ class RecipesShortInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Выводит строку списка покупок."""
+
+    name = serializers.ReadOnlyField(
+        source='ingredient.name'
+    )
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+    # Decimal из модели отдается числом, а не строкой.
+    amount = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('name', 'measurement_unit', 'amount', 'recipes_count')
@@ -0,0 +1,34 @@
+import gzip
+from collections import namedtuple
+
+from recipes.versions import VersionedValue, get_last_modified
+
+Snapshot = namedtuple(
+    'Snapshot', ('version', 'etag', 'last_modified', 'body', 'gzipped')
+)
+
+_snapshots = {}
+
+
+def get_snapshot(name, build):
+    """
+    Готовый к отдаче снимок справочных данных 'name' в памяти воркера.
+    'build' - функция, возвращающая сериализованный список в байтах.
+    Снимок пересобирается только при смене версии данных,
+    сжатая gzip-версия готовится вместе с ним.
+    """
+
+    def build_snapshot(version):
+        body = build()
+        return Snapshot(
+            version=version,
+            etag=f'"{name}-{version}"',
+            last_modified=get_last_modified(name),
+            body=body,
+            gzipped=gzip.compress(body)
+        )
+
+    cached = _snapshots.get(name)
+    if cached is None:
+        cached = _snapshots.setdefault(name, VersionedValue(name))
+    return cached.get(build_snapshot)
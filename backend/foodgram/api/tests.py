@@ -0,0 +1,175 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.management.commands._parity import (get_parity_cases,
+                                                 iter_mismatches)
+from recipes.models import (Ingredient, Recipe, RecipeFavorite,
+                            RecipeIngredients, ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+@override_settings(RESPONSE_CACHE=False)
+class FoodgramTestCase(TestCase):
+    """
+    Три автора с рецептами; пользователь подписан на двух из них,
+    часть рецептов у него в избранном и в корзине.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@foodgram.ru',
+                password='pass'
+            )
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'tag{number}', slug=f'tag{number}', color='#FFFFFF'
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'recipe{number}',
+                image='recipes/images/recipe.png',
+                text='text',
+                cooking_time=number + 1
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:number % len(ingredients) + 1]
+            )
+        for author in cls.authors[:2]:
+            Subscription.objects.create(user=cls.user, author=author)
+        for recipe in Recipe.objects.order_by('id')[:12:3]:
+            RecipeFavorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in Recipe.objects.order_by('id')[:12:4]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = Recipe.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+@override_settings(MEMBERSHIP_CACHE=True)
+class QueryCountTests(FoodgramTestCase):
+    """
+    Число SQL-запросов на чтение не зависит от размера страницы:
+    связи подгружаются пачкой, флаги - подзапросами или из кеша.
+    Кеш очищается перед каждым запросом, поэтому кеш 'membership'
+    загружается заново (два запроса для пользователя).
+    """
+
+    def assert_page_queries(self, client, url, queries, limits=(2, 6)):
+        for limit in limits:
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = client.get(url, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list_anonymous(self):
+        # COUNT, рецепты с автором, теги, ингредиенты.
+        self.assert_page_queries(self.anonymous, '/api/recipes/', 4)
+
+    def test_recipe_list_authenticated(self):
+        # Плюс избранное и корзина пользователя для кеша 'membership'.
+        self.assert_page_queries(self.client, '/api/recipes/', 6)
+
+    def test_recipe_detail(self):
+        # Рецепт с автором, теги, ингредиенты; пользователю - и кеш.
+        url = f'/api/recipes/{self.recipe.id}/'
+        for client, queries in ((self.anonymous, 3), (self.client, 5)):
+            cache.clear()
+            with self.assertNumQueries(queries):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        # COUNT, авторы, рецепты авторов одним запросом.
+        self.assert_page_queries(
+            self.client, '/api/users/subscriptions/', 3, limits=(1, 2)
+        )
+
+
+class CompiledSerializerParityTests(FoodgramTestCase):
+    """
+    Сериализаторы из api.compiled выдают тот же JSON, что и DRF:
+    и для отдельных объектов, и в ответах API с выключенными
+    и включенными COMPILED_SERIALIZERS и MEMBERSHIP_CACHE.
+    """
+
+    urls = (
+        '/api/tags/',
+        '/api/recipes/?limit=12',
+        '/api/recipes/feed/?limit=12',
+        '/api/users/subscriptions/?recipes_limit=2',
+    )
+
+    def test_objects(self):
+        for name, compiled, objects, context in get_parity_cases(
+            self.user, 100
+        ):
+            with self.subTest(case=name):
+                mismatches = list(iter_mismatches(compiled, objects, context))
+                self.assertEqual(mismatches, [])
+
+    def get_content(self, client, url, **flags):
+        cache.clear()
+        with self.settings(**flags):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_responses(self):
+        urls = self.urls + (f'/api/recipes/{self.recipe.id}/', )
+        for url in urls:
+            for membership_cache in (False, True):
+                with self.subTest(url=url, membership_cache=membership_cache):
+                    self.assertEqual(
+                        self.get_content(
+                            self.client,
+                            url,
+                            COMPILED_SERIALIZERS=True,
+                            MEMBERSHIP_CACHE=membership_cache
+                        ),
+                        self.get_content(
+                            self.client,
+                            url,
+                            COMPILED_SERIALIZERS=False,
+                            MEMBERSHIP_CACHE=membership_cache
+                        )
+                    )
+
+    def test_anonymous_responses(self):
+        for url in ('/api/tags/', '/api/recipes/?limit=12'):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get_content(
+                        self.anonymous, url, COMPILED_SERIALIZERS=True
+                    ),
+                    self.get_content(
+                        self.anonymous, url, COMPILED_SERIALIZERS=False
+                    )
+                )
@@ -2,9 +2,11 @@ from django.urls import include, path
 from rest_framework import routers
 
 from recipes.models import Recipe, RecipeFavorite, ShoppingCart
-from .views import (AddToFavOrShopCartCommonView, DownloadShoppingCart,
-                    IngredientsViewSet, MakeSubscription, RecipesViewSet,
-                    ShowSubscriptionViewSet, TagsViewSet)
+from .metrics import metrics_view
+from .views import (AddToFavOrShopCartCommonView, BatchFavOrShopCartView,
+                    DownloadShoppingCart, IngredientsViewSet, MakeSubscription,
+                    RecipesViewSet, ShoppingListView, ShowSubscriptionViewSet,
+                    TagsViewSet)
 
 router = routers.DefaultRouter()
 router.register(r'ingredients', IngredientsViewSet)
@@ -14,6 +16,7 @@ router.register(r'users/subscriptions', ShowSubscriptionViewSet)
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics_view),
     path('users/<int:id>/subscribe/', MakeSubscription.as_view()),
     path('recipes/', include([
 
@@ -23,6 +26,14 @@ urlpatterns = [
         path('<int:id>/shopping_cart/', AddToFavOrShopCartCommonView.as_view(),
              {'primary': ShoppingCart, 'secondary': Recipe}),
 
+        path('favorite/', BatchFavOrShopCartView.as_view(),
+             {'primary': RecipeFavorite}),
+
+        path('shopping_cart/', BatchFavOrShopCartView.as_view(),
+             {'primary': ShoppingCart}),
+
+        path('shopping_list/', ShoppingListView.as_view()),
+
         path('download_shopping_cart/', DownloadShoppingCart.as_view())
     ])),
     path('', include(router.urls)),
@@ -1,31 +1,114 @@
-def get_header_message(queryset):
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import F
+
+from recipes.models import Recipe, ShoppingListItem
+
+SHOPPING_LIST_FIELDS = ('name', 'measurement_unit', 'amount')
+
+
+def get_header_message(user):
     """
     Готовит заголовок для списка покупок из перечня рецептов.
-    На вход поступает queryset экземпляров модели ShoppingCart.
+    Названия рецептов из корзины пользователя достаются одним запросом.
     """
 
-    recipes_list = (", ".join([cart.recipe.name for cart in queryset]))
+    recipes_list = ', '.join(
+        Recipe.objects.filter(
+            in_shopping_cart__user=user
+        ).values_list('name', flat=True)
+    )
     return f'Вы добавили в корзину ингредиенты для: {recipes_list}.'
 
 
-def get_total_list(queryset):
+def get_total_list(user):
     """
     Формирует список покупок.
-    На вход поступает queryset экземпляров модели ShoppingCart.
-    Повторяющиеся ингредиенты суммируются.
-    Структура списка - {'ингредиент': {'ед.изм.': 'количество'}.
-    """
-
-    total_list = {}
-
-    for cart in queryset:
-        r_ingredients = cart.recipe.recipe_ingredients.all()
-        for r_ingredient in r_ingredients:
-            name = r_ingredient.ingredient.name
-            amount = r_ingredient.amount
-            unit = r_ingredient.ingredient.measurement_unit
-            if total_list.get(name) is None:
-                total_list[name] = {unit: amount}
-            else:
-                total_list[name][unit] += amount
-    return total_list
+    Суммы по ингредиентам хранятся в ShoppingListItem и обновляются
+    при изменении корзины, поэтому чтение стоит O(число ингредиентов).
+    Структура строки - {'name', 'measurement_unit', 'amount'}.
+    """
+
+    rows = ShoppingListItem.objects.filter(
+        user=user
+    ).annotate(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit')
+    ).values(
+        'name', 'measurement_unit', 'amount'
+    ).order_by('name', 'measurement_unit')
+    # Сумма хранится как Decimal, в файле это число, как и раньше.
+    return [dict(row, amount=float(row['amount'])) for row in rows]
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает значение параметра 'recipes_limit'.
+    Сверху значение ограничено настройкой RECIPES_LIMIT_MAX,
+    она же используется, если параметр отсутствует в запросе
+    или задан неверно.
+    """
+
+    # Как _positive_int в DRF: isnumeric() пропускает, например, '½'.
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return settings.RECIPES_LIMIT_MAX
+    if recipes_limit < 0:
+        return settings.RECIPES_LIMIT_MAX
+    return min(recipes_limit, settings.RECIPES_LIMIT_MAX)
+
+
+def attach_limited_recipes(authors, request):
+    """
+    Подгружает рецепты для всех авторов страницы одним запросом
+    и сохраняет их в атрибут 'limited_recipes' каждого автора.
+    """
+
+    recipes = Recipe.objects.top_for_authors(
+        [author.id for author in authors],
+        get_recipes_limit(request)
+    )
+    for author in authors:
+        author.limited_recipes = recipes[author.id]
+    return authors
+
+
+class Echo:
+    """Псевдобуфер для csv.writer - возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(message, total_list):
+    yield f'{message}\n\n'
+    for row in total_list:
+        yield f'{row["name"]}: {row["amount"]} {row["measurement_unit"]}\n'
+
+
+def stream_csv(message, total_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_FIELDS)
+    for row in total_list:
+        yield writer.writerow([row[field] for field in SHOPPING_LIST_FIELDS])
+
+
+def stream_json(message, total_list):
+    yield '{"message": %s, "ingredients": [' % json.dumps(
+        message, ensure_ascii=False
+    )
+    for index, row in enumerate(total_list):
+        separator = ', ' if index else ''
+        yield separator + json.dumps(row, ensure_ascii=False)
+    yield ']}'
+
+
+# Формат файла: (генератор строк, content-type).
+SHOPPING_LIST_FORMATS = {
+    'txt': (stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'json': (stream_json, 'application/json'),
+}
@@ -1,70 +1,108 @@
-from io import StringIO
-
+from django.conf import settings
 from django.db import IntegrityError
-from django.db.models import Count
-from django.http import HttpResponse
+from django.db.models import BooleanField, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, views, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from djoser.views import UserViewSet
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.membership import get_membership
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from recipes.tags import get_tag_ids
 from users.models import Subscription, User
+from .compiled import (CompiledRecipesSerializer, CompiledSerializerMixin,
+                       CompiledSubscribeSerializer, CompiledTagsSerializer)
 from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import CustomPagination
+from .pagination import CustomPagination, FeedPagination, RecipePagination
 from .permissions import RecipePermission
-from .serializers import (RecipesCreateSerializer, RecipesSerializer,
-                          SubscribeSerializer)
+from .serializers import (RecipeIdsSerializer, RecipesCreateSerializer,
+                          RecipesSerializer, SubscribeSerializer)
 from .simple_serializers import (IngredientsSerializer,
-                                 RecipesShortInfoSerializer, TagsSerializer)
-from .utils import get_header_message, get_total_list
-from .viewsets import ListViewSet, RetrieveListModelViewSet
+                                 RecipesShortInfoSerializer,
+                                 ShoppingListItemSerializer, TagsSerializer)
+from .utils import (SHOPPING_LIST_FORMATS, attach_limited_recipes,
+                    get_header_message, get_total_list)
+from .viewsets import (AnonymousCacheMixin, ListViewSet, ReferenceDataViewSet,
+                       ReplicaReadMixin)
 
 
 class CustomUserViewSet(UserViewSet):
     pagination_class = CustomPagination
 
 
-class IngredientsViewSet(RetrieveListModelViewSet):
+class IngredientsViewSet(ReferenceDataViewSet):
     """Обработка запросов к ингрeдиентам."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     filter_backends = (IngredientSearchFilter, )
-    search_fields = ('^name', )
 
 
-class TagsViewSet(RetrieveListModelViewSet):
+class TagsViewSet(CompiledSerializerMixin, ReferenceDataViewSet):
     """Обработка запросов к тегам."""
 
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
+    compiled_serializer_class = CompiledTagsSerializer
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
-    """Обработка запросов к рецептам."""
+class RecipesViewSet(ReplicaReadMixin, CompiledSerializerMixin,
+                     AnonymousCacheMixin, viewsets.ModelViewSet):
+    """
+    Обработка запросов к рецептам.
+    Списки и рецепты для анонимов отдаются из кеша ответов.
+    """
 
-    queryset = Recipe.objects.annotated().prefetch_related('tags')
+    queryset = Recipe.objects.all()
     serializer_class = RecipesSerializer
+    compiled_serializer_class = CompiledRecipesSerializer
     permission_classes = (RecipePermission, )
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_queryset(self):
         user = self.request.user
+        queryset = self.queryset.annotated(
+            user, with_flags=not settings.MEMBERSHIP_CACHE
+        )
         tags = self.request.query_params.getlist('tags')
         if tags:
-            return self.queryset.annotated(user).filter(tags__slug__in=tags)
-        return self.queryset.annotated(user).all()
+            return queryset.with_tags(get_tag_ids(tags))
+        return queryset.all()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if settings.MEMBERSHIP_CACHE:
+            context['membership'] = get_membership(self.request.user)
+        return context
 
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return RecipesCreateSerializer
         return RecipesSerializer
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        """Лента рецептов от авторов, на которых подписан пользователь."""
+
+        # Рецепты страницы выбирает FeedPagination.
+        queryset = Recipe.objects.annotated(
+            request.user, with_flags=not settings.MEMBERSHIP_CACHE
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 class AddToFavOrShopCartCommonView(views.APIView):
     """
@@ -100,6 +138,38 @@ class AddToFavOrShopCartCommonView(views.APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class BatchFavOrShopCartView(views.APIView):
+    """
+    Пакетное добавление рецептов в избранное или корзину и удаление
+    из них. Тело запроса - {"ids": [...]}.
+    Вместо запроса на каждый рецепт - один INSERT или один DELETE;
+    в ответе id разложены по результату.
+    """
+
+    def get_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def post(self, request, primary):
+        added, present, missing = primary.objects.bulk_add(
+            request.user, self.get_ids(request)
+        )
+        return Response(
+            data={'added': added, 'present': present, 'missing': missing},
+            status=status.HTTP_200_OK
+        )
+
+    def delete(self, request, primary):
+        removed, missing = primary.objects.bulk_remove(
+            request.user, self.get_ids(request)
+        )
+        return Response(
+            data={'removed': removed, 'missing': missing},
+            status=status.HTTP_200_OK
+        )
+
+
 class MakeSubscription(views.APIView):
     """Обработка запросов на подписку/отписку."""
 
@@ -114,8 +184,9 @@ class MakeSubscription(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        attach_limited_recipes([author], request)
         serializer = SubscribeSerializer(
-            User.objects.annotate(recipes_count=Count('recipes')).get(id=id),
+            author,
             context={'request': request}
         )
         return Response(
@@ -140,44 +211,76 @@ class MakeSubscription(views.APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ShowSubscriptionViewSet(ListViewSet):
+class ShowSubscriptionViewSet(ReplicaReadMixin, CompiledSerializerMixin,
+                              ListViewSet):
     """Отображает текущие подписки пользователя."""
 
     queryset = User.objects.all()
     serializer_class = SubscribeSerializer
+    compiled_serializer_class = CompiledSubscribeSerializer
     pagination_class = CustomPagination
 
     def get_queryset(self):
         user = self.request.user
+        # Все авторы из списка - подписки текущего юзера.
         return User.objects.filter(
             subscribers__user=user
         ).annotate(
-            recipes_count=Count('recipes')
+            is_subscribed=Value(True, output_field=BooleanField())
         )
 
+    def paginate_queryset(self, queryset):
+        """Рецепты всех авторов страницы загружаются одним запросом."""
+
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            attach_limited_recipes(page, self.request)
+        return page
+
+
+class ShoppingListView(views.APIView):
+    """
+    Просмотр списка покупок без очистки корзины.
+    Строки списка уже сгруппированы по ингредиентам в ShoppingListItem.
+    """
+
+    def get(self, request):
+        items = request.user.shopping_list.select_related(
+            'ingredient'
+        ).order_by('ingredient__name', 'ingredient__measurement_unit')
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
 
 class DownloadShoppingCart(views.APIView):
     """
     Обработка запроса на скачивание списка покупок.
-    Список группируется по ингредиентам в вызываемом методе "get_total_list".
+    Список по ингредиентам берется из вызываемого метода "get_total_list".
+    Формат файла задается параметром 'file_format': txt (по умолчанию),
+    csv или json. Файл отдается потоком.
     После обработки запроса и выдачи файла корзина очищается.
     """
 
     def get(self, request):
-        user = request.user
-        queryset = user.shopping_cart.select_related('recipe').all()
-        message = get_header_message(queryset)
-        total_list = get_total_list(queryset)
-
-        f = StringIO()
-        f.name = 'shopping-list.txt'
-        f.write(f'{message}\n\n')
-        for k, v in total_list.items():
-            for unit, amount in v.items():
-                f.write(f'{k}: {amount} {unit}\n')
-
-        response = HttpResponse(f.getvalue(), content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={f.name}'
-        user.shopping_cart.all().delete()
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                data={'errors': 'Проверьте значение параметра file_format!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        user = request.user
+        message = get_header_message(user)
+        # Список вычисляется до очистки корзины.
+        total_list = list(get_total_list(user))
+        ShoppingCart.objects.clear(user)
+
+        stream, content_type = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            stream(message, total_list),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping-list.{file_format}'
+        )
         return response
@@ -1,4 +1,56 @@
-from rest_framework import mixins, permissions, viewsets
+import gzip
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import mixins, permissions, status, viewsets
+
+from recipes.replicas import choose_replica, primary, use_replica
+from recipes.versions import RECIPES_VERSION, get_last_modified
+from .renderers import FastJSONRenderer
+from .response_cache import get_cache_key
+from .snapshots import get_snapshot
+
+
+def json_response(request, gzipped, body=None):
+    """
+    Ответ с готовым JSON: сжатое тело, если клиент принимает gzip,
+    иначе - исходное (при необходимости распакованное).
+    """
+
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if 'gzip' in accept_encoding:
+        response = HttpResponse(gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        if body is None:
+            body = gzip.decompress(gzipped)
+        response = HttpResponse(body, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding', ))
+    return response
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы (GET, HEAD, OPTIONS) читают с одной из реплик
+    (recipes.replicas). Реплика выбирается после аутентификации:
+    пользователь, недавно что-то записавший, читает с основной БД.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with ExitStack() as self.replica_stack:
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            self.replica_stack.enter_context(
+                use_replica(choose_replica(request.user))
+            )
 
 
 class ListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
@@ -9,3 +61,88 @@ class RetrieveListModelViewSet(mixins.RetrieveModelMixin,
                                mixins.ListModelMixin,
                                viewsets.GenericViewSet):
     permission_classes = (permissions.AllowAny, )
+
+
+class ReferenceDataViewSet(ReplicaReadMixin, RetrieveListModelViewSet):
+    """
+    Вьюсет для справочных данных (теги, ингредиенты).
+    Полный список без параметров запроса отдается из снимка в памяти
+    воркера с заголовками ETag и Last-Modified, на условный запрос
+    отвечает 304 без обращения к БД.
+    Данные публичные, поэтому аутентификация (и запрос токена) не нужна.
+    """
+
+    authentication_classes = ()
+
+    def build_snapshot(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return FastJSONRenderer().render(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        snapshot = get_snapshot(
+            self.queryset.model._meta.label_lower,
+            self.build_snapshot
+        )
+        response = get_conditional_response(
+            request._request,
+            etag=snapshot.etag,
+            last_modified=snapshot.last_modified
+        )
+        if response is None:
+            response = json_response(
+                request, snapshot.gzipped, snapshot.body
+            )
+
+        response['ETag'] = snapshot.etag
+        response['Last-Modified'] = http_date(snapshot.last_modified)
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class AnonymousCacheMixin:
+    """
+    Кеш ответов list/retrieve для анонимных пользователей.
+    Для анонима ответ не зависит от пользователя, поэтому готовое
+    сжатое gzip тело хранится в кеше по ключу из параметров запроса
+    и версий данных (см. response_cache.get_cache_key).
+    Кешируются только успешные ответы в JSON.
+    Включается настройкой RESPONSE_CACHE, нужен общий для всех
+    процессов кеш.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (not settings.RESPONSE_CACHE
+                or request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return handler(request, *args, **kwargs)
+
+        key = get_cache_key(request)
+        gzipped = cache.get(key)
+        if gzipped is None:
+            # Ответ хранится до смены версии: сразу после изменения
+            # рецептов реплика может отставать - читаем с основной БД.
+            modified = get_last_modified(RECIPES_VERSION)
+            with ExitStack() as stack:
+                if time.time() - modified <= settings.DB_REPLICA_LAG:
+                    stack.enter_context(primary())
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            gzipped = gzip.compress(FastJSONRenderer().render(response.data))
+            cache.set(key, gzipped, settings.RESPONSE_CACHE_TIMEOUT)
+
+        response = json_response(request, gzipped)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
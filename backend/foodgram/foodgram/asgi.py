@@ -0,0 +1,26 @@
+"""
+ASGI config for foodgram project.
+
+Django 2.2 has no ASGI handler of its own, so the WSGI application
+is wrapped with asgiref's WsgiToAsgi. The event loop of the ASGI server
+(uvicorn) receives request bodies and sends responses, Django views run
+in a thread pool of ASGI_THREADS threads. A slow client does not hold
+a whole worker process, as with the gunicorn sync worker.
+
+gunicorn foodgram.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
+
+# Индекс ингредиентов строится при старте воркера,
+# а при запуске gunicorn с --preload - один раз в мастер-процессе.
+from recipes.search import ingredient_index  # noqa: E402
+
+ingredient_index.warm()
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,6 +39,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -72,8 +74,49 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', "default_password"),
         'HOST': os.getenv('DB_HOST', default="db"),
         'PORT': os.getenv('DB_PORT', default="5432"),
+        # Постоянные соединения, секунд; простоявшие дольше
+        # DB_HEALTH_CHECK_IDLE секунд проверяются в начале запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
+DB_HEALTH_CHECK_IDLE = int(os.getenv('DB_HEALTH_CHECK_IDLE', 30))
+
+
+def replica_database(address):
+    """
+    Настройки реплики: копия 'default' с другим адресом 'host[:port]',
+    для SQLite - с другим файлом БД. В тестах реплика - зеркало 'default'.
+    """
+
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if replica['ENGINE'].endswith('sqlite3'):
+        replica['NAME'] = address
+    else:
+        host, _, port = address.partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    return replica
+
+
+# Реплики для чтения списков и рецептов (recipes.replicas) -
+# адреса через пробел: DB_REPLICAS='replica1 replica2:5433'.
+DATABASE_REPLICAS = []
+for number, address in enumerate(os.getenv('DB_REPLICAS', '').split(), 1):
+    DATABASES[f'replica{number}'] = replica_database(address)
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['recipes.replicas.ReplicaRouter']
+# Отставание реплик, секунд: столько пользователь после записи
+# читает с основной БД, чтобы видеть свои изменения.
+DB_REPLICA_LAG = int(os.getenv('DB_REPLICA_LAG', 5))
+
+# Для нескольких воркеров и воркера картинок нужен общий кеш
+# (в docker-compose - memcached), чтобы версии данных были общими.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith('LocMemCache')
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,15 +152,79 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'django_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Максимальный размер загружаемого изображения рецепта, байт.
+IMAGE_MAX_SIZE = int(os.getenv('IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+# Картинки обрабатываются воркером 'manage.py process_images'.
+# True - обработка сразу после коммита в том же процессе (без воркера).
+IMAGE_JOBS_EAGER = os.getenv('IMAGE_JOBS_EAGER', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    # orjson, если установлен; иначе - стандартный json.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Максимум рецептов каждого автора в списке подписок.
+RECIPES_LIMIT_MAX = int(os.getenv('RECIPES_LIMIT_MAX', 50))
+
+# Лента подписок: авторам с большим числом подписчиков рецепты
+# не раздаются по лентам при публикации, а подмешиваются при чтении.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+# Сколько последних рецептов автора попадает в ленту при подписке.
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', 50))
+
+# Запросы и SQL-запросы дольше порога (мс) пишутся в лог.
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))
+# Адреса, с которых доступен /api/metrics/ (Prometheus в сети docker;
+# через nginx эндпоинт закрыт).
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split()
+
+# Максимум рецептов в одном пакетном запросе к избранному/корзине.
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 100))
+
+# Флаги 'is_favorited'/'is_in_shopping_cart' берутся из закешированных
+# множеств id рецептов пользователя вместо подзапросов EXISTS.
+# Кеш сбрасывается при изменениях, но другие процессы видят это только
+# через общий кеш - с LocMemCache по умолчанию выключен.
+MEMBERSHIP_CACHE = os.getenv('MEMBERSHIP_CACHE', str(SHARED_CACHE)) == 'True'
+MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv('MEMBERSHIP_CACHE_TIMEOUT', 60 * 60))
+
+# list/retrieve рецептов, тегов и подписок в JSON отдаются
+# сериализаторами из api.compiled вместо сериализаторов DRF.
+COMPILED_SERIALIZERS = os.getenv('COMPILED_SERIALIZERS', 'True') == 'True'
+
+# Токен -> пользователь кешируется в памяти воркера на TOKEN_CACHE_TIMEOUT
+# секунд (столько же другие воркеры могут видеть токен после выхода).
+# TOKEN_CACHE_SHARED - еще и в общем кеше, он сбрасывается сразу.
+TOKEN_CACHE = os.getenv('TOKEN_CACHE', 'True') == 'True'
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 30))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'False') == 'True'
+TOKEN_CACHE_SHARED_TIMEOUT = int(
+    os.getenv('TOKEN_CACHE_SHARED_TIMEOUT', 60 * 60)
+)
+
+# Кеш ответов о рецептах для анонимов. Устаревшие ответы сбрасываются
+# сменой версии рецептов, а она видна другим процессам только через
+# общий кеш - с LocMemCache кеш ответов по умолчанию выключен.
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', str(SHARED_CACHE)) == 'True'
+# Время жизни закешированных ответов, секунд.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60 * 60))
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.CustomUsersSerializer',
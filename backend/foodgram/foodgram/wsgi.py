@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# Индекс ингредиентов строится при старте воркера,
+# а при запуске gunicorn с --preload - один раз в мастер-процессе.
+from recipes.search import ingredient_index  # noqa: E402
+
+ingredient_index.warm()
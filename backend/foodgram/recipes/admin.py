@@ -1,8 +1,93 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 
 from .models import (Ingredient, Recipe, RecipeFavorite, RecipeIngredients,
                      RecipeTags, ShoppingCart, Tag)
+from .shopping_list import track_recipe_ingredients
+
+# С какого размера таблицы вместо COUNT(*) берется оценка из статистики.
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц.
+    Для списка без фильтров на PostgreSQL количество строк берется
+    из статистики планировщика (pg_class.reltuples) вместо COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row is not None and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр с полем ввода вместо списка всех значений,
+    чтобы не выводить в боковую панель всю таблицу.
+    """
+
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Без непустого списка вариантов фильтр не отображается.
+        return ((), )
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+
+class AuthorFilter(InputFilter):
+    parameter_name = 'author'
+    title = 'автору (username или e-mail)'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        return queryset.filter(
+            Q(author__username__istartswith=value)
+            | Q(author__email__istartswith=value)
+        )
+
+
+class NameFilter(InputFilter):
+    parameter_name = 'name'
+    title = 'названию'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        return queryset.filter(name__istartswith=value)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Общие настройки для админок больших таблиц."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -20,19 +105,26 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         'pk', 'name', 'author', 'ingredient_list',
         'tag_list', 'image_preview', 'is_favorited_count'
     )
-    list_filter = ('author', 'name', 'tags')
-    search_fields = ('author', 'name')
+    list_select_related = ('author', )
+    list_filter = (AuthorFilter, NameFilter, 'tags')
+    search_fields = ('name', 'author__username')
     readonly_fields = ('image_preview', )
+    autocomplete_fields = ('author', )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'ingredients', 'tags'
+        )
 
     def is_favorited_count(self, obj):
         """Сколько раз добавлен в избранное."""
 
-        return obj.recipe_favorite.count()
+        return obj.favorites_count
 
     def ingredient_list(self, obj):
         """Показ ингредиентов в рецепте."""
@@ -60,15 +152,53 @@ class RecipeAdmin(admin.ModelAdmin):
         )
 
     is_favorited_count.short_description = 'Добавили в избранное раз'
+    is_favorited_count.admin_order_field = 'favorites_count'
     ingredient_list.short_description = 'Ингредиенты'
     tag_list.short_description = 'Теги'
     image_preview.short_description = 'Картинка'
 
 
+class RecipeIngredientsAdmin(LargeTableAdmin):
+    """Изменения состава рецептов переносятся в списки покупок."""
+
+    list_display = ('pk', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')} - {None}
+        with track_recipe_ingredients(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = queryset.values_list('recipe_id', flat=True)
+        with track_recipe_ingredients(recipe_ids):
+            super().delete_queryset(request, queryset)
+
+
+class RecipeTagsAdmin(LargeTableAdmin):
+    list_display = ('pk', 'recipe', 'tag')
+    list_select_related = ('recipe', 'tag')
+    list_filter = ('tag', )
+    autocomplete_fields = ('recipe', )
+
+
+class UserRecipeAdmin(LargeTableAdmin):
+    """Для связок рецепт-пользователь: избранное и корзина."""
+
+    list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(RecipeIngredients)
-admin.site.register(RecipeTags)
-admin.site.register(RecipeFavorite)
-admin.site.register(ShoppingCart)
+admin.site.register(RecipeIngredients, RecipeIngredientsAdmin)
+admin.site.register(RecipeTags, RecipeTagsAdmin)
+admin.site.register(RecipeFavorite, UserRecipeAdmin)
+admin.site.register(ShoppingCart, UserRecipeAdmin)
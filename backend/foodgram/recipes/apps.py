@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .fulltext import install_search
+        from .replicas import check_connections, mark_connections
+
+        post_migrate.connect(install_search, sender=self)
+        request_started.connect(check_connections)
+        request_finished.connect(mark_connections)
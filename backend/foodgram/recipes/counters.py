@@ -0,0 +1,39 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счетчик одним UPDATE с F()-выражением."""
+
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством строк 'model', ссылающихся на OuterRef."""
+
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все денормализованные счетчики по исходным таблицам."""
+
+    from users.models import Subscription, User
+    from .models import Recipe, RecipeFavorite, ShoppingCart
+
+    Recipe.objects.update(
+        favorites_count=count_subquery(RecipeFavorite, 'recipe'),
+        cart_count=count_subquery(ShoppingCart, 'recipe')
+    )
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        subscribers_count=count_subquery(Subscription, 'author')
+    )
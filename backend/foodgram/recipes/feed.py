@@ -0,0 +1,147 @@
+from itertools import islice
+
+from django.conf import settings
+
+from users.models import Subscription, User
+from .models import FeedEntry, Recipe
+
+# Размер пачки при массовом заполнении лент.
+FEED_BATCH_SIZE = 5000
+
+
+def get_subscribers_count(author_id):
+    """
+    Число подписчиков автора из БД. Экземпляру автора из запроса
+    верить нельзя: request.user может быть копией из кеша токенов
+    (api.authentication) с устаревшим счетчиком.
+    """
+
+    return User.objects.filter(pk=author_id).values_list(
+        'subscribers_count', flat=True
+    ).first() or 0
+
+
+def get_subscriber_ids(author_id):
+    """
+    Подписчики автора для раздачи рецепта по лентам.
+    Если подписчиков больше FEED_FANOUT_LIMIT, возвращает None:
+    рецепты таких авторов добавляются в ленту при чтении.
+    """
+
+    if get_subscribers_count(author_id) > settings.FEED_FANOUT_LIMIT:
+        return None
+    return list(
+        Subscription.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+
+    subscriber_ids = get_subscriber_ids(recipe.author_id)
+    if not subscriber_ids:
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe=recipe, author_id=recipe.author_id)
+         for user_id in subscriber_ids],
+        ignore_conflicts=True
+    )
+
+
+def backfill_feeds(author, user_ids):
+    """Добавляет последние FEED_BACKFILL рецептов автора в ленты 'user_ids'."""
+
+    recipe_ids = list(
+        Recipe.objects.filter(
+            author=author
+        ).order_by('-id').values_list('id', flat=True)[:settings.FEED_BACKFILL]
+    )
+    entries = (
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author.id)
+        for user_id in user_ids for recipe_id in recipe_ids
+    )
+    # Пачками: на пачки под лимиты БД bulk_create делит сам.
+    batch = list(islice(entries, FEED_BATCH_SIZE))
+    while batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, FEED_BATCH_SIZE))
+
+
+def add_author_to_feed(user, author):
+    """При подписке в ленту попадают последние FEED_BACKFILL рецептов."""
+
+    if get_subscriber_ids(author.id) is not None:
+        backfill_feeds(author, [user.id])
+
+
+def remove_author_from_feed(user, author):
+    """
+    Убирает рецепты автора из ленты отписавшегося пользователя.
+    Если после отписки автор перестал быть популярным, его рецепты
+    раздаются по лентам оставшихся подписчиков: при чтении
+    они больше не добавляются.
+    """
+
+    FeedEntry.objects.filter(user=user, author=author).delete()
+    if get_subscribers_count(author.id) == settings.FEED_FANOUT_LIMIT:
+        backfill_feeds(author, get_subscriber_ids(author.id))
+
+
+def rebuild_feeds():
+    """
+    Пересобирает таблицу лент по подпискам: нужна для подписок,
+    созданных до появления лент или в обход сигналов,
+    и для авторов, число подписчиков которых разошлось со счетчиком.
+    Запускать после rebuild_counters.
+    """
+
+    FeedEntry.objects.all().delete()
+    authors = User.objects.filter(
+        subscribers_count__gt=0,
+        subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).only('id', 'subscribers_count')
+    for author in authors.iterator():
+        backfill_feeds(author, get_subscriber_ids(author.id))
+
+
+def get_feed_ids(user, limit, cursor=None, descending=True):
+    """
+    id рецептов ленты пользователя - не больше 'limit', после 'cursor'
+    в порядке убывания id (descending=False - по возрастанию).
+    Записи ленты читаются по индексу (user, recipe) условием
+    'recipe_id < cursor LIMIT limit', рецепты популярных авторов,
+    которые не раздаются по лентам при записи, - отдельным
+    таким же запросом по индексу (author, id). Оба списка
+    ограничены 'limit' и сливаются здесь.
+    """
+
+    lookup = 'lt' if descending else 'gt'
+    prefix = '-' if descending else ''
+    entries = FeedEntry.objects.filter(user=user)
+    if cursor is not None:
+        entries = entries.filter(**{f'recipe_id__{lookup}': cursor})
+    recipe_ids = set(
+        entries.order_by(
+            f'{prefix}recipe_id'
+        ).values_list('recipe_id', flat=True)[:limit]
+    )
+
+    popular_authors = list(
+        Subscription.objects.filter(
+            user=user,
+            author__subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).order_by().values_list('author_id', flat=True)
+    )
+    if popular_authors:
+        recipes = Recipe.objects.filter(author_id__in=popular_authors)
+        if cursor is not None:
+            recipes = recipes.filter(**{f'id__{lookup}': cursor})
+        # Автор мог стать популярным позже: его рецепты есть и в ленте.
+        recipe_ids.update(
+            recipes.order_by(
+                f'{prefix}id'
+            ).values_list('id', flat=True)[:limit]
+        )
+    return sorted(recipe_ids, reverse=descending)[:limit]
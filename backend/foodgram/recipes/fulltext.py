@@ -0,0 +1,163 @@
+"""
+Полнотекстовый поиск рецептов по названию и описанию.
+
+PostgreSQL: в таблице рецептов хранится вычисляемая колонка 'search_vector'
+(tsvector с русской конфигурацией, название весомее описания) с GIN-индексом.
+Колонка генерируется самой БД, поэтому всегда актуальна после сохранения.
+SQLite: FTS5-таблица, которую синхронизируют триггеры.
+Структуры создаются после миграций приложения 'recipes'.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .search import normalize
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRESQL_SETUP = (
+    f"""
+    ALTER TABLE recipes_recipe
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(text, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector)
+    """,
+)
+
+# В FTS5-таблицу пишется копия с заменой 'ё' на 'е'.
+SQLITE_FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+SQLITE_SETUP = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(
+        name, text, tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts (rowid, name, text) VALUES (
+            new.id,
+            {SQLITE_FOLD.format('new.name')},
+            {SQLITE_FOLD.format('new.text')}
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM recipes_recipe_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        UPDATE recipes_recipe_fts SET
+            name = {SQLITE_FOLD.format('new.name')},
+            text = {SQLITE_FOLD.format('new.text')}
+        WHERE rowid = new.id;
+    END
+    """,
+    "DELETE FROM recipes_recipe_fts",
+    f"""
+    INSERT INTO recipes_recipe_fts (rowid, name, text)
+    SELECT id, {SQLITE_FOLD.format('name')}, {SQLITE_FOLD.format('text')}
+    FROM recipes_recipe
+    """,
+)
+
+
+def install_search(using='default', **kwargs):
+    """Обработчик post_migrate: создает структуры для поиска."""
+
+    connection = connections[using]
+    statements = {
+        'postgresql': POSTGRESQL_SETUP,
+        'sqlite': SQLITE_SETUP,
+    }.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def fts5_query(query):
+    """
+    Превращает пользовательскую строку в запрос FTS5:
+    каждое слово в кавычках и с поиском по префиксу, 'ё' -> 'е'.
+    """
+
+    words = re.findall(r'\w+', normalize(query))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def tsquery_prefix(query):
+    """
+    Превращает пользовательскую строку в запрос to_tsquery PostgreSQL:
+    каждое слово в кавычках и с поиском по префиксу, слова через '&'.
+    Как fts5_query: 'кур' находит 'курица' в обеих БД.
+    """
+
+    words = re.findall(r'\w+', query.lower())
+    return ' & '.join(f"'{word}':*" for word in words)
+
+
+def search_recipes(queryset, query):
+    """
+    Фильтрует рецепты по поисковой строке и добавляет поле 'search_rank'
+    с релевантностью. Результат отсортирован по убыванию релевантности.
+    """
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        match = tsquery_prefix(query)
+        if not match:
+            return queryset.none()
+        tsquery = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.annotate(
+            search_match=RawSQL(
+                f'recipes_recipe.search_vector @@ {tsquery}',
+                (match,),
+                output_field=BooleanField()
+            ),
+            search_rank=RawSQL(
+                f'ts_rank(recipes_recipe.search_vector, {tsquery})',
+                (match,),
+                output_field=FloatField()
+            )
+        ).filter(search_match=True)
+    elif vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        # RawSQL внутри id__in SQLite оборачивает в лишние скобки
+        # и берет только первую строку подзапроса, поэтому extra().
+        queryset = queryset.extra(
+            where=[
+                'recipes_recipe.id IN (SELECT rowid FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s)'
+            ],
+            params=(match,)
+        ).annotate(search_rank=RawSQL(
+            # bm25 тем меньше, чем документ релевантнее.
+            'SELECT -bm25(recipes_recipe_fts) FROM recipes_recipe_fts '
+            'WHERE recipes_recipe_fts MATCH %s '
+            'AND recipes_recipe_fts.rowid = recipes_recipe.id',
+            (match,),
+            output_field=FloatField()
+        ))
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+
+    return queryset.order_by('-search_rank', 'id')
@@ -0,0 +1,192 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+from .models import Recipe
+
+IMAGES_DIR = os.path.join('recipes', 'images')
+
+# Размер куска base64-строки, кратен 4 - куски декодируются независимо.
+CHUNK_SIZE = 64 * 1024
+
+# Варианты изображения: имя -> максимальные ширина и высота.
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1200, 1200),
+}
+VARIANT_FORMAT, VARIANT_EXT = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Имена файлов из пайплайна - sha256 содержимого.
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ImageIngestError(ValueError):
+    pass
+
+
+def decode_base64(byte_string, max_size):
+    """
+    Декодирует base64 кусками во временный файл, одновременно считая
+    sha256 и проверяя размер. Возвращает (файл, hexdigest).
+    """
+
+    if len(byte_string) * 3 // 4 > max_size + 3:
+        raise ImageIngestError('Изображение слишком большое!')
+
+    digest = hashlib.sha256()
+    size = 0
+    temp_file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        for start in range(0, len(byte_string), CHUNK_SIZE):
+            try:
+                chunk = base64.b64decode(
+                    byte_string[start:start + CHUNK_SIZE], validate=True
+                )
+            except binascii.Error:
+                raise ImageIngestError(
+                    'Некорректная base64-строка изображения!'
+                )
+            size += len(chunk)
+            if size > max_size:
+                raise ImageIngestError('Изображение слишком большое!')
+            digest.update(chunk)
+            temp_file.write(chunk)
+    except ImageIngestError:
+        temp_file.close()
+        raise
+    temp_file.seek(0)
+    return temp_file, digest.hexdigest()
+
+
+def verify_image(image_file):
+    """Проверяет файл через Pillow, возвращает расширение по формату."""
+
+    try:
+        with Image.open(image_file) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise ImageIngestError(
+            'Загрузите корректное изображение!'
+        )
+    finally:
+        image_file.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ImageIngestError('Неподдерживаемый формат изображения!')
+    return ALLOWED_FORMATS[image_format]
+
+
+def variant_name(name, variant):
+    """recipes/images/<hash>.png -> recipes/images/<hash>/card.webp"""
+
+    base = os.path.splitext(name)[0]
+    return f'{base}/{variant}.{VARIANT_EXT}'
+
+
+def has_variants(name):
+    """Варианты есть только у изображений, прошедших пайплайн."""
+
+    stem = os.path.splitext(os.path.basename(name or ''))[0]
+    return bool(HASHED_NAME.match(stem))
+
+
+def create_variants(name, storage=default_storage):
+    """
+    Создает уменьшенные копии изображения, если их еще нет.
+    verify() не декодирует картинку: битый файл (например, обрезанный
+    JPEG) падает только здесь. Тогда созданные варианты удаляются,
+    а ошибка Pillow превращается в ImageIngestError.
+    """
+
+    created = []
+    try:
+        with storage.open(name) as original, Image.open(original) as image:
+            image.load()
+            if VARIANT_FORMAT == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            for variant, size in IMAGE_VARIANTS.items():
+                path = variant_name(name, variant)
+                if storage.exists(path):
+                    continue
+                copy = image.copy()
+                copy.thumbnail(size)
+                buffer = BytesIO()
+                copy.save(buffer, VARIANT_FORMAT, quality=80)
+                created.append(
+                    storage.save(path, ContentFile(buffer.getvalue()))
+                )
+    except Exception:
+        for path in created:
+            storage.delete(path)
+        raise ImageIngestError('Загрузите корректное изображение!')
+
+
+def ingest_base64_image(byte_string, storage=default_storage):
+    """
+    Пайплайн загрузки изображения из base64-строки:
+    потоковое декодирование с лимитом размера, проверка Pillow,
+    имя по хешу содержимого (одинаковые файлы не дублируются)
+    и подготовка вариантов. Возвращает имя файла в хранилище.
+    """
+
+    image_file, digest = decode_base64(byte_string, settings.IMAGE_MAX_SIZE)
+    with image_file:
+        ext = verify_image(image_file)
+        name = os.path.join(IMAGES_DIR, f'{digest}.{ext}')
+        saved = not storage.exists(name)
+        if saved:
+            name = storage.save(name, File(image_file))
+    try:
+        create_variants(name, storage)
+    except ImageIngestError:
+        # Оригинал, сохраненный этим вызовом, больше никому не нужен.
+        if saved:
+            storage.delete(name)
+        raise
+    return name
+
+
+def delete_image(name, storage=default_storage):
+    """Удаляет изображение вместе с вариантами."""
+
+    if has_variants(name):
+        for variant in IMAGE_VARIANTS:
+            storage.delete(variant_name(name, variant))
+    storage.delete(name)
+
+
+def delete_unused_image(name, storage=default_storage):
+    """Удаляет изображение, если на него не ссылается ни один рецепт."""
+
+    if name and not Recipe.objects.filter(image=name).exists():
+        delete_image(name, storage)
+
+
+def get_variant_urls(field_file):
+    """Ссылки на варианты; у старых изображений - ссылка на оригинал."""
+
+    if not field_file:
+        return None
+    storage = field_file.storage
+    if not has_variants(field_file.name):
+        return {variant: field_file.url for variant in IMAGE_VARIANTS}
+    return {
+        variant: storage.url(variant_name(field_file.name, variant))
+        for variant in IMAGE_VARIANTS
+    }
@@ -0,0 +1,109 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .images import ImageIngestError, delete_unused_image, ingest_base64_image
+from .models import IMAGE_FAILED, IMAGE_PENDING, IMAGE_READY, ImageJob, Recipe
+from .versions import RECIPES_VERSION, bump_version_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Через сколько задача, взятая упавшим воркером, снова станет доступной.
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_image(recipe, byte_string):
+    """
+    Ставит картинку рецепта в очередь обработки.
+    Пока задача не выполнена, у рецепта статус 'pending'
+    (и прежняя картинка, если она была).
+    """
+
+    Recipe.objects.filter(pk=recipe.pk).update(image_status=IMAGE_PENDING)
+    recipe.image_status = IMAGE_PENDING
+    job = ImageJob.objects.create(recipe=recipe, payload=byte_string)
+    if settings.IMAGE_JOBS_EAGER:
+        transaction.on_commit(lambda: process_job(job.pk))
+    return job
+
+
+def available_jobs():
+    """Свободные задачи и задачи, зависшие у упавшего воркера."""
+
+    stale = timezone.now() - STALE_JOB_TIMEOUT
+    return ImageJob.objects.filter(
+        Q(started__isnull=True) | Q(started__lt=stale)
+    )
+
+
+def claim_job(job_id):
+    """Забирает задачу в работу; False, если ее уже взял другой воркер."""
+
+    return bool(
+        available_jobs().filter(pk=job_id).update(started=timezone.now())
+    )
+
+
+def mark_failed(recipe):
+    Recipe.objects.filter(pk=recipe.pk).update(image_status=IMAGE_FAILED)
+
+
+def process_job(job_id):
+    """
+    Декодирование, проверка и варианты картинки - пайплайн
+    'ingest_base64_image'. Старая картинка рецепта удаляется,
+    если на нее больше никто не ссылается.
+    """
+
+    if not claim_job(job_id):
+        return
+    job = ImageJob.objects.select_related('recipe').get(pk=job_id)
+    recipe = job.recipe
+    # Более новая задача для того же рецепта перекроет эту.
+    superseded = ImageJob.objects.filter(
+        recipe=recipe, pk__gt=job.pk
+    ).exists()
+
+    if not superseded:
+        try:
+            name = ingest_base64_image(job.payload)
+        except ImageIngestError as error:
+            logger.warning('Image job %s failed: %s', job.pk, error)
+            mark_failed(recipe)
+        except Exception:
+            # Любая другая ошибка не должна ронять воркер: иначе задача
+            # останется взятой и через STALE_JOB_TIMEOUT уронит его снова.
+            logger.exception('Image job %s crashed', job.pk)
+            mark_failed(recipe)
+        else:
+            old_image = recipe.image.name
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image=name,
+                image_status=IMAGE_READY
+            )
+            if old_image != name:
+                delete_unused_image(old_image)
+        # update() не отправляет сигналы - кеш ответов сбрасываем сами.
+        bump_version_on_commit(RECIPES_VERSION)
+    job.delete()
+
+
+def process_pending(limit=None):
+    """Обрабатывает задачи из очереди по порядку, возвращает их число."""
+
+    job_ids = available_jobs().values_list('id', flat=True)
+    if limit is not None:
+        job_ids = job_ids[:limit]
+    job_ids = list(job_ids)
+    for job_id in job_ids:
+        try:
+            process_job(job_id)
+        except Exception:
+            # Например, ошибка БД: задача вернется в очередь
+            # через STALE_JOB_TIMEOUT, остальные обрабатываются дальше.
+            logger.exception('Image job %s was not processed', job_id)
+    return len(job_ids)
@@ -0,0 +1,258 @@
+import base64
+import json
+import math
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from users.models import User
+from ._dataset import BENCHMARK_TAGS, USERNAME_PREFIX
+
+# Прозрачный PNG 1x1 для создания и редактирования рецептов.
+PIXEL_PNG = base64.b64encode(bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000'
+    '000049454e44ae426082'
+)).decode()
+
+# Сценарий: имя, клиент ('anon' или 'auth'), HTTP-метод и имя метода
+# Benchmark, который возвращает (путь, данные).
+Scenario = namedtuple('Scenario', ('name', 'client', 'method', 'request'))
+
+SCENARIOS = (
+    Scenario('recipes_list_anonymous', 'anon', 'get', 'recipes_list'),
+    Scenario('recipes_list', 'auth', 'get', 'recipes_list'),
+    Scenario('recipes_list_100', 'auth', 'get', 'recipes_list_100'),
+    Scenario('recipes_list_tags_anonymous', 'anon', 'get', 'recipes_tags'),
+    Scenario('recipes_list_tags', 'auth', 'get', 'recipes_tags'),
+    Scenario('recipe_detail_anonymous', 'anon', 'get', 'recipe_detail'),
+    Scenario('recipe_detail', 'auth', 'get', 'recipe_detail'),
+    Scenario('subscriptions', 'auth', 'get', 'subscriptions'),
+    Scenario('ingredients_list', 'anon', 'get', 'ingredients_list'),
+    Scenario('ingredient_search', 'anon', 'get', 'ingredient_search'),
+    Scenario('shopping_cart_download', 'auth', 'get', 'download'),
+    Scenario('recipe_create', 'auth', 'post', 'recipe_create'),
+    Scenario('recipe_update', 'auth', 'patch', 'recipe_update'),
+)
+
+
+class BenchmarkDataError(Exception):
+    pass
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class Benchmark:
+    """
+    Замеры горячих эндпоинтов тестовым клиентом Django на наборе
+    из generate_data. Для каждого сценария - p50/p95 времени ответа,
+    пропускная способность (запросов в секунду в один поток),
+    число SQL-запросов и пиковая память (tracemalloc) одного запроса.
+    Запросы на запись убираются за собой.
+    """
+
+    def __init__(self, iterations=20, warmup=2):
+        self.iterations = iterations
+        self.warmup = warmup
+
+    def prepare(self):
+        self.user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX,
+            shopping_cart__isnull=False,
+            authors__isnull=False
+        ).order_by('id').first()
+        if self.user is None:
+            raise BenchmarkDataError(
+                'Generate data first: manage.py generate_data'
+            )
+
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        host = hosts[0] if hosts else 'localhost'
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.clients = {
+            'anon': Client(HTTP_HOST=host),
+            'auth': Client(
+                HTTP_HOST=host, HTTP_AUTHORIZATION=f'Token {token.key}'
+            ),
+        }
+        self.cart = list(
+            self.user.shopping_cart.values_list('recipe_id', flat=True)
+        )
+        self.recipe_id = self.cart[0]
+        self.tags = [slug for _, slug, _ in BENCHMARK_TAGS[:2]]
+        self.tag_ids = list(
+            Tag.objects.filter(slug__in=self.tags).values_list('id', flat=True)
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)[:3]
+        )
+        self.search = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True
+        ).first()[:3]
+        self.created = []
+        self.updated_recipe = None
+
+    def recipe_payload(self, name):
+        return {
+            'name': name,
+            'text': 'Рецепт для замеров.',
+            'cooking_time': 10,
+            'image': f'data:image/png;base64,{PIXEL_PNG}',
+            'tags': self.tag_ids,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in self.ingredient_ids
+            ],
+        }
+
+    def recipes_list(self):
+        return '/api/recipes/', None
+
+    def recipes_list_100(self):
+        return '/api/recipes/?limit=100', None
+
+    def recipes_tags(self):
+        return '/api/recipes/?' + '&'.join(
+            f'tags={slug}' for slug in self.tags
+        ), None
+
+    def recipe_detail(self):
+        return f'/api/recipes/{self.recipe_id}/', None
+
+    def subscriptions(self):
+        return '/api/users/subscriptions/?recipes_limit=3', None
+
+    def ingredients_list(self):
+        return '/api/ingredients/', None
+
+    def ingredient_search(self):
+        return f'/api/ingredients/?name={self.search}', None
+
+    def download(self):
+        # Скачивание очищает корзину - перед каждым запросом
+        # возвращаем ее в исходное состояние (вне замера).
+        ShoppingCart.objects.bulk_add(self.user, self.cart)
+        return '/api/recipes/download_shopping_cart/', None
+
+    def recipe_create(self):
+        return '/api/recipes/', self.recipe_payload('Замер: создание')
+
+    def recipe_update(self):
+        if self.updated_recipe is None:
+            response = self.send('auth', 'post', *self.recipe_create())
+            self.updated_recipe = json.loads(response.content)['id']
+        return (
+            f'/api/recipes/{self.updated_recipe}/',
+            self.recipe_payload('Замер: редактирование')
+        )
+
+    def send(self, client, method, path, data):
+        if data is None:
+            response = getattr(self.clients[client], method)(path)
+        else:
+            response = getattr(self.clients[client], method)(
+                path, json.dumps(data), content_type='application/json'
+            )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if method == 'post' and response.status_code == 201:
+            self.created.append(json.loads(response.content)['id'])
+        return response
+
+    def measure(self, scenario):
+        prepare = getattr(self, scenario.request)
+        for _ in range(self.warmup):
+            self.send(scenario.client, scenario.method, *prepare())
+
+        durations = []
+        for _ in range(self.iterations):
+            request = prepare()
+            start = time.perf_counter()
+            response = self.send(scenario.client, scenario.method, *request)
+            durations.append(time.perf_counter() - start)
+
+        # Отдельный проход: счетчик запросов и tracemalloc искажают время.
+        request = prepare()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            self.send(scenario.client, scenario.method, *request)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(durations) * 1000, 2),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+            'mean_ms': round(statistics.mean(durations) * 1000, 2),
+            'rps': round(len(durations) / sum(durations), 1),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def cleanup(self):
+        for recipe in Recipe.objects.filter(id__in=self.created):
+            recipe.delete()
+        ShoppingCart.objects.bulk_add(self.user, self.cart)
+
+    def run(self, names=None, log=print):
+        self.prepare()
+        results = {}
+        try:
+            for scenario in SCENARIOS:
+                if names and scenario.name not in names:
+                    continue
+                results[scenario.name] = self.measure(scenario)
+                log(format_result(scenario.name, results[scenario.name]))
+        finally:
+            self.cleanup()
+        return {
+            'meta': {
+                'recipes': Recipe.objects.count(),
+                'users': User.objects.count(),
+                'database': connection.vendor,
+                'iterations': self.iterations,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+
+
+def format_result(name, result):
+    return (
+        f'{name:30} {result["status"]:4} '
+        f'p50 {result["p50_ms"]:9.2f} ms  p95 {result["p95_ms"]:9.2f} ms  '
+        f'{result["rps"]:8.1f} rps  '
+        f'{result["queries"]:4} queries  {result["peak_memory_kb"]:9.1f} KiB'
+    )
+
+
+def compare(baseline, current):
+    """Строки сравнения с сохраненным базовым замером."""
+
+    def change(old, new):
+        return f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            yield f'{name:30} no baseline'
+            continue
+        yield (
+            f'{name:30} '
+            f'p50 {old["p50_ms"]:.2f} -> {result["p50_ms"]:.2f} ms '
+            f'({change(old["p50_ms"], result["p50_ms"])})  '
+            f'p95 {old["p95_ms"]:.2f} -> {result["p95_ms"]:.2f} ms '
+            f'({change(old["p95_ms"], result["p95_ms"])})  '
+            f'queries {old["queries"]} -> {result["queries"]}'
+        )
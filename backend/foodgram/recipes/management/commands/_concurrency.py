@@ -0,0 +1,196 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+from ._benchmark import BenchmarkDataError, percentile
+from ._dataset import USERNAME_PREFIX
+
+# Режимы развертывания: приложение и класс воркера gunicorn.
+MODES = {
+    'wsgi': ('foodgram.wsgi:application', 'sync'),
+    'asgi': ('foodgram.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+# gunicorn 20.0 нельзя запустить через 'python -m gunicorn'.
+GUNICORN = 'from gunicorn.app.wsgiapp import run; run()'
+
+
+class ServerError(Exception):
+    pass
+
+
+class ConcurrencyBenchmark:
+    """
+    Сравнение режимов развертывания под медленными клиентами.
+    Для каждого режима запускается gunicorn, 'slow_clients' клиентов
+    по частям в течение 'slow_seconds' отправляют тело POST-запроса
+    (как при загрузке картинки по медленной сети), а в это время
+    'requests' обычных клиентов запрашивают 'path'.
+    Загрузки идут от пользователя из generate_data, иначе
+    запрос отклоняется до чтения тела и воркер не занимает.
+    Замеряется время ответа обычным клиентам.
+    """
+
+    def __init__(self, workers=1, slow_clients=4, slow_seconds=3.0,
+                 requests=20, path='/api/tags/', port=8765, timeout=60,
+                 worker_classes=None, log=print):
+        self.workers = workers
+        self.worker_classes = worker_classes or {}
+        self.timeout = timeout
+        self.slow_clients = slow_clients
+        self.slow_seconds = slow_seconds
+        self.requests = requests
+        self.path = path
+        self.port = port
+        self.log = log
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        self.host = hosts[0] if hosts else 'localhost'
+
+    def prepare(self):
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').first()
+        if user is None:
+            raise BenchmarkDataError(
+                'Generate data first: manage.py generate_data'
+            )
+        self.token, _ = Token.objects.get_or_create(user=user)
+
+    def start_server(self, mode):
+        app, worker_class = MODES[mode]
+        server = subprocess.Popen(
+            [
+                sys.executable, '-c', GUNICORN, app,
+                '--bind', f'127.0.0.1:{self.port}',
+                '--workers', str(self.workers),
+                '--worker-class', self.worker_classes.get(mode, worker_class),
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy()
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise ServerError(f'{mode} server exited: {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), 1).close()
+                return server
+            except OSError:
+                time.sleep(0.1)
+        server.terminate()
+        raise ServerError(f'{mode} server did not start')
+
+    def request_head(self, method, path, headers=''):
+        return (
+            f'{method} {path} HTTP/1.1\r\n'
+            f'Host: {self.host}\r\n'
+            f'Connection: close\r\n'
+            f'{headers}\r\n'
+        ).encode()
+
+    async def read_status(self, reader, writer):
+        try:
+            response = await asyncio.wait_for(reader.read(), self.timeout)
+        except asyncio.TimeoutError:
+            response = b''
+        writer.close()
+        status_line = response.split(b'\r\n', 1)[0].split()
+        return int(status_line[1]) if len(status_line) > 1 else 0
+
+    async def slow_client(self):
+        """Медленная загрузка: тело уходит частями до 'slow_seconds'."""
+
+        chunks = 10
+        body = b'{"image": "data:image/png;base64,' + b'A' * 10000 + b'"}'
+        size = len(body) // chunks + 1
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(self.request_head(
+            'POST',
+            '/api/recipes/',
+            f'Authorization: Token {self.token.key}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+        ))
+        try:
+            for start in range(0, len(body), size):
+                writer.write(body[start:start + size])
+                await writer.drain()
+                await asyncio.sleep(self.slow_seconds / chunks)
+            return await self.read_status(reader, writer)
+        except ConnectionError:
+            # Сервер закрыл соединение, не дочитав тело.
+            writer.close()
+            return 0
+
+    async def fast_client(self, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(self.request_head('GET', self.path))
+        status = await self.read_status(reader, writer)
+        return status, time.perf_counter() - start
+
+    async def load(self):
+        slow = [
+            asyncio.ensure_future(self.slow_client())
+            for _ in range(self.slow_clients)
+        ]
+        # Обычные запросы равномерно распределены по времени загрузок.
+        fast = await asyncio.gather(*(
+            self.fast_client(
+                0.1 + number * self.slow_seconds / self.requests
+            )
+            for number in range(self.requests)
+        ))
+        await asyncio.gather(*slow)
+        return fast
+
+    def measure(self, mode):
+        server = self.start_server(mode)
+        try:
+            loop = asyncio.new_event_loop()
+            try:
+                # Прогрев: первый запрос к воркеру.
+                loop.run_until_complete(self.fast_client(0))
+                start = time.perf_counter()
+                fast = loop.run_until_complete(self.load())
+                total = time.perf_counter() - start
+            finally:
+                loop.close()
+        finally:
+            server.terminate()
+            server.wait()
+
+        durations = [duration for _, duration in fast]
+        return {
+            'ok': sum(1 for status, _ in fast if status == 200),
+            'p50_ms': round(statistics.median(durations) * 1000, 2),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+            'max_ms': round(max(durations) * 1000, 2),
+            'total_s': round(total, 2),
+        }
+
+    def run(self, modes):
+        self.prepare()
+        results = {}
+        for mode in modes:
+            results[mode] = self.measure(mode)
+            self.log(format_result(mode, results[mode], self.requests))
+        return results
+
+
+def format_result(mode, result, requests):
+    return (
+        f'{mode:5} {result["ok"]:3}/{requests} ok  '
+        f'p50 {result["p50_ms"]:9.2f} ms  p95 {result["p95_ms"]:9.2f} ms  '
+        f'max {result["max_ms"]:9.2f} ms  total {result["total_s"]:6.2f} s'
+    )
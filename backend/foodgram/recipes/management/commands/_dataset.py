@@ -0,0 +1,275 @@
+import os
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.contrib.admin.models import LogEntry
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import rebuild_counters
+from recipes.feed import rebuild_feeds
+from recipes.membership import invalidate_membership
+from recipes.models import (IMAGE_READY, FeedEntry, ImageJob, Ingredient,
+                            Recipe, RecipeFavorite, RecipeIngredients,
+                            RecipeTags, ShoppingCart, ShoppingListItem, Tag)
+from recipes.search import INGREDIENTS_VERSION
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.tags import TAGS_VERSION
+from recipes.versions import (RECIPES_VERSION, bump_version,
+                              bump_version_on_commit)
+from users.models import Subscription, User
+from ._private import NATURAL_KEYS, batched, iter_rows, upsert_batch
+
+# Все сгенерированные пользователи начинаются с этого префикса.
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+
+BENCHMARK_TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+    ('Десерт', 'dessert', '#F4A4C0'),
+    ('Выпечка', 'bakery', '#C9A66B'),
+    ('Напитки', 'drinks', '#4FA3D9'),
+)
+DISHES = (
+    'Суп', 'Салат', 'Пирог', 'Рагу', 'Омлет', 'Каша', 'Запеканка',
+    'Паста', 'Плов', 'Котлеты', 'Блины', 'Смузи',
+)
+RECIPE_IMAGE = 'recipes/images/benchmark.png'
+
+# Размеры набора относительно числа рецептов.
+RECIPES_PER_USER = 10
+AUTHORS_SHARE = 5
+INGREDIENTS_PER_RECIPE = (3, 10)
+TAGS_PER_RECIPE = (1, 3)
+FAVORITES_PER_USER = (0, 20)
+CART_PER_USER = (0, 8)
+SUBSCRIPTIONS_PER_USER = (0, 10)
+
+
+class DatasetGenerator:
+    """
+    Детерминированный генератор тестовых данных: при одинаковых
+    'recipes' и 'seed' получается одинаковый набор.
+    Пишет пачками через bulk_create с явными id, сигналы
+    не отправляются - счетчики, списки покупок и версии
+    пересчитываются в конце.
+    """
+
+    def __init__(self, recipes, seed=42, batch_size=5000, log=print):
+        self.recipes = recipes
+        self.users = max(10, recipes // RECIPES_PER_USER)
+        self.authors = max(5, self.users // AUTHORS_SHARE)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.log = log
+
+    def random(self, stream):
+        """
+        Отдельный генератор на каждую таблицу: таблицы пишутся
+        независимо и не зависят от порядка генерации друг друга.
+        """
+
+        return random.Random(f'{self.seed}:{stream}')
+
+    @staticmethod
+    def sample(rng, population, bounds):
+        return rng.sample(
+            population, min(rng.randint(*bounds), len(population))
+        )
+
+    @staticmethod
+    def next_id(model):
+        last = model.objects.order_by('-id').values_list('id', flat=True)
+        return (last.first() or 0) + 1
+
+    def bulk_create(self, model, objects):
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        self.log(f'{model.__name__}: {total} rows')
+
+    def load_reference_data(self, ingredients_path):
+        if not Ingredient.objects.exists():
+            key = NATURAL_KEYS['ingredient']
+            for batch in batched(iter_rows(ingredients_path), 1000):
+                upsert_batch(Ingredient, batch, key)
+        for name, slug, color in BENCHMARK_TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.tag_ids = list(
+            Tag.objects.filter(
+                slug__in=[slug for _, slug, _ in BENCHMARK_TAGS]
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def iter_users(self):
+        password = make_password(PASSWORD)
+        for number in range(self.users):
+            yield User(
+                id=self.first_user + number,
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                first_name='Бенчмарк',
+                last_name=str(number),
+                password=password
+            )
+
+    def iter_recipes(self):
+        rng = self.random('recipes')
+        for number in range(self.recipes):
+            dish = rng.choice(DISHES)
+            yield Recipe(
+                id=self.first_recipe + number,
+                author_id=self.first_user + rng.randrange(self.authors),
+                name=f'{dish} #{number}',
+                text=f'{dish}: пошаговый рецепт номер {number}.',
+                cooking_time=rng.randint(5, 180),
+                image=RECIPE_IMAGE,
+                image_status=IMAGE_READY
+            )
+
+    def iter_recipe_ingredients(self):
+        rng = self.random('recipe_ingredients')
+        for number in range(self.recipes):
+            for ingredient_id in self.sample(
+                    rng, self.ingredient_ids, INGREDIENTS_PER_RECIPE):
+                yield RecipeIngredients(
+                    recipe_id=self.first_recipe + number,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+
+    def iter_recipe_tags(self):
+        rng = self.random('recipe_tags')
+        for number in range(self.recipes):
+            for tag_id in self.sample(rng, self.tag_ids, TAGS_PER_RECIPE):
+                yield RecipeTags(
+                    recipe_id=self.first_recipe + number,
+                    tag_id=tag_id
+                )
+
+    def iter_user_recipes(self, model, per_user):
+        rng = self.random(model._meta.model_name)
+        recipe_ids = range(
+            self.first_recipe, self.first_recipe + self.recipes
+        )
+        for number in range(self.users):
+            for recipe_id in self.sample(rng, recipe_ids, per_user):
+                yield model(
+                    user_id=self.first_user + number,
+                    recipe_id=recipe_id
+                )
+
+    def iter_subscriptions(self):
+        rng = self.random('subscriptions')
+        author_ids = range(self.first_user, self.first_user + self.authors)
+        for number in range(self.users):
+            user_id = self.first_user + number
+            for author_id in self.sample(
+                    rng, author_ids, SUBSCRIPTIONS_PER_USER):
+                if author_id != user_id:
+                    yield Subscription(user_id=user_id, author_id=author_id)
+
+    def generate(self, ingredients_path):
+        self.load_reference_data(ingredients_path)
+        self.first_user = self.next_id(User)
+        self.first_recipe = self.next_id(Recipe)
+
+        self.bulk_create(User, self.iter_users())
+        self.bulk_create(Recipe, self.iter_recipes())
+        self.bulk_create(RecipeIngredients, self.iter_recipe_ingredients())
+        self.bulk_create(RecipeTags, self.iter_recipe_tags())
+        self.bulk_create(
+            RecipeFavorite,
+            self.iter_user_recipes(RecipeFavorite, FAVORITES_PER_USER)
+        )
+        self.bulk_create(
+            ShoppingCart,
+            self.iter_user_recipes(ShoppingCart, CART_PER_USER)
+        )
+        self.bulk_create(Subscription, self.iter_subscriptions())
+        self.finish()
+
+    def finish(self):
+        # Явные id не двигают последовательности PostgreSQL.
+        sequence_sql = connection.ops.sequence_reset_sql(
+            no_style(), [User, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+        rebuild_counters()
+        rebuild_shopping_lists()
+        rebuild_feeds()
+        for name in (RECIPES_VERSION, TAGS_VERSION, INGREDIENTS_VERSION):
+            bump_version(name)
+
+
+def clear_dataset(rebuild=True):
+    """
+    Удаляет сгенерированных пользователей вместе с их данными.
+    Таблицы чистятся снизу вверх одним DELETE на каждую, мимо
+    поштучных сигналов удаления: каскадный delete() на сотнях тысяч
+    строк обновлял бы счетчики, ленты и списки покупок по одной
+    строке. Вместо сигналов счетчики, списки покупок и ленты
+    пересобираются целиком; rebuild=False - если вызывающий
+    пересоберет их сам. Возвращает число удаленных строк.
+    """
+
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    recipes = Recipe.objects.filter(author__in=users)
+    by_user_or_recipe = Q(user__in=users) | Q(recipe__in=recipes)
+    querysets = (
+        FeedEntry.objects.filter(by_user_or_recipe),
+        ImageJob.objects.filter(recipe__in=recipes),
+        RecipeIngredients.objects.filter(recipe__in=recipes),
+        RecipeTags.objects.filter(recipe__in=recipes),
+        RecipeFavorite.objects.filter(by_user_or_recipe),
+        ShoppingCart.objects.filter(by_user_or_recipe),
+        ShoppingListItem.objects.filter(user__in=users),
+        Subscription.objects.filter(Q(user__in=users) | Q(author__in=users)),
+        Token.objects.filter(user__in=users),
+        LogEntry.objects.filter(user__in=users),
+        User.groups.through.objects.filter(user__in=users),
+        User.user_permissions.through.objects.filter(user__in=users),
+        recipes,
+        users,
+    )
+    with transaction.atomic():
+        # Кеш 'membership' остальных пользователей хранит id
+        # удаляемых рецептов: сигналы его не сбросят.
+        affected = set(
+            RecipeFavorite.objects.filter(recipe__in=recipes).exclude(
+                user__in=users
+            ).values_list('user_id', flat=True)
+        ) | set(
+            ShoppingCart.objects.filter(recipe__in=recipes).exclude(
+                user__in=users
+            ).values_list('user_id', flat=True)
+        )
+        deleted = sum(
+            queryset._raw_delete(queryset.db) for queryset in querysets
+        )
+        for user_id in affected:
+            invalidate_membership(user_id)
+        if rebuild:
+            rebuild_counters()
+            rebuild_shopping_lists()
+            rebuild_feeds()
+            for name in (RECIPES_VERSION, TAGS_VERSION):
+                bump_version_on_commit(name)
+    return deleted
+
+
+def default_ingredients_path():
+    return os.path.join(settings.BASE_DIR, 'ingredients.csv')
@@ -0,0 +1,73 @@
+from django.db.models import BooleanField, Value
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.compiled import (CompiledRecipesSerializer,
+                          CompiledSubscribeSerializer, CompiledTagsSerializer)
+from api.renderers import FastJSONRenderer
+from api.utils import attach_limited_recipes
+from recipes.membership import get_membership
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+def get_parity_cases(user, limit):
+    """
+    Наборы объектов для сравнения с DRF: (название, сериализатор,
+    объекты, контекст). Рецепты - для анонима и для пользователя
+    с флагами из аннотаций и из кеша 'membership', подписки -
+    для пользователя, по 'limit' объектов в наборе.
+    """
+
+    request = Request(APIRequestFactory().get('/', {'recipes_limit': 3}))
+    request.user = user
+    context = {'request': request}
+    membership_context = {
+        'request': request,
+        'membership': get_membership(user)
+    }
+
+    recipes = Recipe.objects.order_by('-id')
+    subscriptions = list(
+        User.objects.filter(subscribers__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')[:limit]
+    )
+    attach_limited_recipes(subscriptions, request)
+
+    return (
+        ('tags', CompiledTagsSerializer, Tag.objects.all(), context),
+        (
+            'recipes (anonymous)',
+            CompiledRecipesSerializer,
+            recipes.annotated(None)[:limit],
+            context
+        ),
+        (
+            'recipes',
+            CompiledRecipesSerializer,
+            recipes.annotated(user)[:limit],
+            context
+        ),
+        (
+            'recipes (membership cache)',
+            CompiledRecipesSerializer,
+            recipes.annotated(user, with_flags=False)[:limit],
+            membership_context
+        ),
+        ('subscriptions', CompiledSubscribeSerializer, subscriptions, context),
+    )
+
+
+def iter_mismatches(compiled, objects, context):
+    """
+    Объекты, для которых JSON сериализатора 'compiled' расходится
+    с его 'parity': (объект, вывод DRF, вывод 'compiled').
+    """
+
+    renderer = FastJSONRenderer()
+    for obj in objects:
+        expected = renderer.render(compiled.parity(obj, context=context).data)
+        actual = renderer.render(compiled(obj, context=context).data)
+        if expected != actual:
+            yield obj, expected, actual
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+# Натуральные ключи моделей для повторного импорта без дублей.
+NATURAL_KEYS = {
+    'ingredient': ('name', 'measurement_unit'),
+    'tag': ('slug', ),
+}
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Потоковое чтение JSON-массива объектов: файл читается кусками,
+    объекты разбираются по одному, весь файл в память не загружается.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ImportFormatError('JSON file must contain an array')
+    position = 1
+    while True:
+        position = skip_separators(buffer, position)
+        if buffer[position:position + 1] == ']':
+            return
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Объект не дочитан - нужен следующий кусок файла.
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ImportFormatError('Unexpected end of JSON file')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield obj
+
+
+def iter_rows(file_path):
+    """Строки файла в виде словарей: csv с заголовком или json-массив."""
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        if os.path.splitext(file_path)[1].lower() == '.json':
+            yield from iter_json_array(file)
+        else:
+            yield from csv.DictReader(file, delimiter=',')
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def prepare_rows(model, rows, key):
+    """
+    Приводит значения к типам полей модели и убирает дубли
+    натурального ключа внутри пачки (побеждает последняя строка).
+    """
+
+    prepared = {}
+    for row in rows:
+        values = {
+            name: model._meta.get_field(name).to_python(value)
+            for name, value in row.items()
+        }
+        prepared[tuple(values[name] for name in key)] = values
+    return prepared
+
+
+def upsert_batch(model, rows, key):
+    """
+    Вставка пачки с обновлением по натуральному ключу средствами ORM:
+    один запрос на поиск существующих строк, bulk_create и bulk_update.
+    """
+
+    prepared = prepare_rows(model, rows, key)
+    existing = {
+        tuple(getattr(obj, name) for name in key): obj
+        for obj in model.objects.filter(**{
+            f'{key[0]}__in': {values[key[0]] for values in prepared.values()}
+        })
+    }
+    to_create, to_update = [], []
+    fields = set()
+    for natural_key, values in prepared.items():
+        obj = existing.get(natural_key)
+        if obj is None:
+            to_create.append(model(**values))
+            continue
+        changed = [
+            name for name, value in values.items()
+            if getattr(obj, name) != value
+        ]
+        if changed:
+            for name in changed:
+                setattr(obj, name, values[name])
+            fields.update(changed)
+            to_update.append(obj)
+
+    model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(fields))
+    return len(to_create) + len(to_update)
+
+
+def copy_batch(connection, model, rows, key):
+    """
+    Импорт пачки через PostgreSQL COPY во временную таблицу
+    и INSERT ... ON CONFLICT по натуральному ключу.
+    На ключе должно быть ограничение уникальности.
+    """
+
+    prepared = list(prepare_rows(model, rows, key).values())
+    if not prepared:
+        return 0
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    temp_table = quote(f'import_{table}')
+    names = list(prepared[0])
+    columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in names
+    )
+    key_columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in key
+    )
+    updates = ', '.join(
+        f'{quote(model._meta.get_field(name).column)} = '
+        f'EXCLUDED.{quote(model._meta.get_field(name).column)}'
+        for name in names if name not in key
+    )
+    action = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values in prepared:
+        writer.writerow([values[name] for name in names])
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {temp_table} ON COMMIT DROP '
+            f'AS SELECT {columns} FROM {quote(table)} WITH NO DATA'
+        )
+        cursor.execute(f'TRUNCATE {temp_table}')
+        cursor.copy_expert(
+            f'COPY {temp_table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {quote(table)} ({columns}) '
+            f'SELECT {columns} FROM {temp_table} '
+            f'ON CONFLICT ({key_columns}) {action}'
+        )
+        return cursor.rowcount
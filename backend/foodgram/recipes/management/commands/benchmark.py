@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ._benchmark import SCENARIOS, Benchmark, BenchmarkDataError, compare
+
+
+class Command(BaseCommand):
+    """
+    Замеры горячих эндпоинтов на данных из generate_data.
+    Результат (p50/p95, число запросов, пиковая память) можно
+    сохранить в JSON и сравнить со следующим прогоном.
+    Пример команды -
+    manage.py benchmark --output before.json
+    manage.py benchmark --compare before.json
+    """
+
+    help = 'Benchmarks hot API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Define number of timed requests per scenario'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Define number of untimed requests per scenario'
+        )
+        parser.add_argument(
+            '--scenario',
+            nargs='+',
+            choices=[scenario.name for scenario in SCENARIOS],
+            help='Run only the given scenarios'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Save results to a JSON file'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Compare results with a saved JSON file'
+        )
+
+    def handle(self, *args, **options):
+        benchmark = Benchmark(options['iterations'], options['warmup'])
+        try:
+            results = benchmark.run(options['scenario'], self.stdout.write)
+        except BenchmarkDataError as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Results saved to {options["output"]}.')
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            for line in compare(baseline, results):
+                self.stdout.write(line)
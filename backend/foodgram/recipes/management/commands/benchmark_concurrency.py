@@ -0,0 +1,102 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ._benchmark import BenchmarkDataError
+from ._concurrency import MODES, ConcurrencyBenchmark, ServerError
+
+
+class Command(BaseCommand):
+    """
+    Сравнение развертывания через WSGI (sync-воркеры gunicorn)
+    и ASGI (uvicorn-воркеры) под медленными клиентами.
+    Нужны установленные gunicorn и uvicorn.
+    Пример команды -
+    manage.py benchmark_concurrency --slow-clients 8 --slow-seconds 5
+    """
+
+    help = 'Compares WSGI and ASGI deployments under slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            nargs='+',
+            choices=list(MODES),
+            default=list(MODES),
+            help='Run only the given deployment modes'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Define number of gunicorn workers'
+        )
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=4,
+            help='Define number of slow uploading clients'
+        )
+        parser.add_argument(
+            '--slow-seconds',
+            type=float,
+            default=3.0,
+            help='Define upload duration of a slow client'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Define number of regular requests during uploads'
+        )
+        parser.add_argument(
+            '--path',
+            type=str,
+            default='/api/tags/',
+            help='Define path of regular requests'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Define port of the benchmarked server'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=60,
+            help='Define timeout of a single request, seconds'
+        )
+        parser.add_argument(
+            '--asgi-worker-class',
+            type=str,
+            default='uvicorn.workers.UvicornWorker',
+            help='Define gunicorn worker class for the asgi mode'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Save results to a JSON file'
+        )
+
+    def handle(self, *args, **options):
+        benchmark = ConcurrencyBenchmark(
+            workers=options['workers'],
+            slow_clients=options['slow_clients'],
+            slow_seconds=options['slow_seconds'],
+            requests=options['requests'],
+            path=options['path'],
+            port=options['port'],
+            timeout=options['timeout'],
+            worker_classes={'asgi': options['asgi_worker_class']},
+            log=self.stdout.write
+        )
+        try:
+            results = benchmark.run(options['mode'])
+        except (BenchmarkDataError, ServerError) as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Results saved to {options["output"]}.')
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+from ._parity import get_parity_cases, iter_mismatches
+
+
+class Command(BaseCommand):
+    """
+    Проверка совпадения вывода сериализаторов из api.compiled
+    с обычными сериализаторами DRF на текущих данных: каждый объект
+    рендерится в JSON обоими и сравнивается побайтно.
+    Те же проверки на тестовых данных - в api.tests.
+    Пример команды - manage.py check_serializers --user 15 --limit 500
+    """
+
+    help = 'Checks that compiled serializers match DRF serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Define user id; by default a user with subscriptions'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=200,
+            help='Define number of checked objects per case'
+        )
+
+    def get_user(self, user_id):
+        users = User.objects.order_by('id')
+        if user_id is not None:
+            user = users.filter(id=user_id).first()
+        else:
+            user = users.filter(authors__isnull=False).first()
+        if user is None:
+            raise CommandError('User not found')
+        return user
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        mismatches = 0
+        for name, compiled, objects, context in get_parity_cases(
+            user, options['limit']
+        ):
+            objects = list(objects)
+            for obj, expected, actual in iter_mismatches(
+                compiled, objects, context
+            ):
+                mismatches += 1
+                self.stderr.write(
+                    f'{name} {obj.pk}:\n'
+                    f'  drf:      {expected.decode()}\n'
+                    f'  compiled: {actual.decode()}'
+                )
+            self.stdout.write(f'{name}: {len(objects)} checked')
+        if mismatches:
+            raise CommandError(f'{mismatches} mismatches found')
+        self.stdout.write(self.style.SUCCESS('Serializers match.'))
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ._dataset import DatasetGenerator, clear_dataset, default_ingredients_path
+
+
+class Command(BaseCommand):
+    """
+    Генерация детерминированного набора данных для замеров:
+    пользователи, рецепты с ингредиентами из ingredients.csv и тегами,
+    избранное, корзины и подписки.
+    Пользователей - в 10 раз меньше, чем рецептов.
+    Пример команды - manage.py generate_data --recipes 100000
+    """
+
+    help = 'Generates a synthetic dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=10000,
+            help='Define number of recipes: 10000, 100000, 1000000'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Define random seed'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Define number of rows written at once'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=str,
+            default=default_ingredients_path(),
+            help='Define path to ingredients csv or json file'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated data first'
+        )
+
+    def handle(self, *args, **options):
+        t1 = time.time()
+
+        generator = DatasetGenerator(
+            options['recipes'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write
+        )
+        with transaction.atomic():
+            if options['clear']:
+                # Счетчики и ленты пересоберет generate().
+                deleted = clear_dataset(rebuild=False)
+                self.stdout.write(f'{deleted} rows deleted.')
+            generator.generate(options['ingredients'])
+
+        t2 = time.time()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Dataset successfully generated! '
+                f'The execution time was: {t2-t1}s!'
+            )
+        )
@@ -1,52 +1,97 @@
-import csv
 import time
 
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.versions import bump_version
+from ._private import (NATURAL_KEYS, ImportFormatError, batched, copy_batch,
+                       iter_rows, upsert_batch)
 
 
 class Command(BaseCommand):
     """
-    Импорт данных в БД из csv файла.
+    Импорт данных в БД из csv или json файла.
     Для корректного импорта первая строка csv файла
-    должна содержать все поля импортируемой модели.
+    должна содержать все поля импортируемой модели,
+    json файл должен содержать массив объектов с такими же полями.
+    Файл читается потоково и записывается пачками по --batch-size строк
+    в одной транзакции. Строки с уже существующим натуральным ключом
+    обновляются, поэтому повторный импорт безопасен.
+    На PostgreSQL пачки загружаются через COPY.
     Пример команды - manage.py importcsv path/to/file.csv model_name
     """
 
-    help = 'Imports data from csv-file'
+    help = 'Imports data from csv or json file'
 
     def add_arguments(self, parser):
         parser.add_argument(
             'file_path',
             type=str,
-            help='Define path to csv file'
+            help='Define path to csv or json file'
         )
         parser.add_argument(
             'model',
             type=str,
             help='Define model name'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Define number of rows written at once'
+        )
+        parser.add_argument(
+            '--key',
+            nargs='+',
+            help='Define natural key fields used to update existing rows'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Do not use PostgreSQL COPY'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
         model_cl = apps.get_model('recipes', model_name=options['model'])
+        key = options['key'] or NATURAL_KEYS.get(model_cl._meta.model_name)
+        if not key:
+            raise CommandError(
+                f'Define natural key for {model_cl.__name__} with --key'
+            )
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
         t1 = time.time()
+        total = 0
 
-        with open(file_path, "r", encoding="utf-8") as csv_file:
-            reader = csv.reader(csv_file, delimiter=',')
-            header = next(reader)
-            instances = []
-            for row in reader:
-                obj_dict = {key: value for key, value in zip(header, row)}
-                instances.append(model_cl(**obj_dict))
+        try:
+            with transaction.atomic():
+                for batch in batched(iter_rows(file_path),
+                                     options['batch_size']):
+                    if use_copy:
+                        copy_batch(connection, model_cl, batch, key)
+                    else:
+                        upsert_batch(model_cl, batch, key)
+                    total += len(batch)
+                    elapsed = time.time() - t1
+                    self.stdout.write(
+                        f'{total} rows processed, '
+                        f'{total / elapsed if elapsed else 0:.0f} rows/s'
+                    )
+        except ImportFormatError as error:
+            raise CommandError(error)
 
-            model_cl.objects.bulk_create(instances)
+        # bulk_create не отправляет сигналы - версию данных
+        # увеличиваем вручную.
+        bump_version(model_cl._meta.label_lower)
 
         t2 = time.time()
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'File successfully imported!'
-                f'The execution time was: {t2-t1}s!'
+                f'File successfully imported! '
+                f'{total} rows, the execution time was: {t2-t1}s!'
             )
         )
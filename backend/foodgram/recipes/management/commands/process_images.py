@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.jobs import process_pending
+
+
+class Command(BaseCommand):
+    """
+    Воркер фоновой обработки картинок рецептов.
+    Забирает задачи из таблицы ImageJob, пока не будет остановлен.
+    Пример команды - manage.py process_images --sleep 1
+    """
+
+    help = 'Processes queued recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the current queue and exit'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Define pause between queue polls, seconds'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=20,
+            help='Define max jobs taken per poll'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending(options['batch'])
+            if processed:
+                self.stdout.write(f'Processed {processed} image(s).')
+            if options['once'] and not processed:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import rebuild_counters
+from recipes.feed import rebuild_feeds
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """
+    Пересчет денормализованных счетчиков (избранное, корзина,
+    рецепты и подписчики), списков покупок и лент, если они разошлись
+    с данными. Запускается и при развертывании: ленты заполняются
+    для подписок, созданных до их появления.
+    Пример команды - manage.py rebuild_counters
+    """
+
+    help = 'Rebuilds denormalized counters'
+
+    def handle(self, *args, **options):
+        t1 = time.time()
+
+        with transaction.atomic():
+            rebuild_counters()
+            rebuild_shopping_lists()
+            rebuild_feeds()
+
+        t2 = time.time()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Counters successfully rebuilt! '
+                f'The execution time was: {t2-t1}s!'
+            )
+        )
@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RecipeFavorite, ShoppingCart
+
+MEMBERSHIP_KEY = 'membership:{}'
+
+# Множества id рецептов в избранном и в корзине пользователя.
+Membership = namedtuple('Membership', ('favorites', 'cart'))
+EMPTY_MEMBERSHIP = Membership(frozenset(), frozenset())
+
+
+def get_membership(user):
+    """
+    Id рецептов из избранного и корзины пользователя.
+    Оба множества загружаются одним заходом и хранятся в кеше
+    до изменения избранного или корзины.
+    """
+
+    if user is None or not user.is_authenticated:
+        return EMPTY_MEMBERSHIP
+
+    key = MEMBERSHIP_KEY.format(user.id)
+    membership = cache.get(key)
+    if membership is None:
+        membership = Membership(
+            favorites=frozenset(
+                RecipeFavorite.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)
+            ),
+            cart=frozenset(
+                ShoppingCart.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)
+            )
+        )
+        cache.set(key, membership, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return membership
+
+
+def invalidate_membership(user_id):
+    """
+    Сбрасывает кеш после коммита: иначе параллельный запрос
+    успеет закешировать еще не измененные данные.
+    """
+
+    transaction.on_commit(
+        lambda: cache.delete(MEMBERSHIP_KEY.format(user_id))
+    )
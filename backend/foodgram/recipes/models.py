@@ -4,13 +4,22 @@ from django.core.validators import (MaxLengthValidator, MinLengthValidator,
 from django.db import models
 from webcolors import CSS3_HEX_TO_NAMES
 
-from .querysets import RecipeManager
+from .querysets import RecipeManager, ShoppingCartQuerySet, UserRecipeQuerySet
 from .utils import get_upload_path
 
 COLORS = list(
     (k, v.capitalize()) for k, v in CSS3_HEX_TO_NAMES.items()
 )
 
+IMAGE_PENDING = 'pending'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUSES = (
+    (IMAGE_PENDING, 'Обрабатывается'),
+    (IMAGE_READY, 'Готово'),
+    (IMAGE_FAILED, 'Ошибка обработки'),
+)
+
 
 class Ingredient(models.Model):
     """Ингредиент."""
@@ -28,6 +37,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -66,7 +81,10 @@ class Tag(models.Model):
 
 
 class Recipe(models.Model):
-    """Рецепт."""
+    """
+    Рецепт.
+    Счетчики избранного и корзины обновляются сигналами.
+    """
 
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -91,6 +109,13 @@ class Recipe(models.Model):
         upload_to=get_upload_path,
         verbose_name='Картинка'
     )
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+        editable=False,
+        verbose_name='Статус картинки'
+    )
     name = models.CharField(
         max_length=255,
         verbose_name='Название рецепта'
@@ -104,12 +129,38 @@ class Recipe(models.Model):
         max_length=255,
         verbose_name='Описание'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавили в избранное раз'
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавили в корзину раз'
+    )
     objects = RecipeManager()
 
     class Meta:
-        ordering = ['name']
+        ordering = ['name', 'id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        # Индексы под сортировки курсорной пагинации (ключ, id).
+        indexes = [
+            models.Index(
+                fields=['name', 'id'],
+                name='recipe_name_id_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', 'id'],
+                name='recipe_cooking_time_id_idx'
+            ),
+            # Последние рецепты автора: лента и ее заполнение.
+            models.Index(
+                fields=['author', 'id'],
+                name='recipe_author_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -187,6 +238,9 @@ class RecipeTags(models.Model):
 class RecipeFavorite(models.Model):
     """Избранные рецепты. Связка рецепт-пользователь."""
 
+    # Счетчик у рецепта для пакетных операций UserRecipeQuerySet.
+    counter_field = 'favorites_count'
+
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
@@ -199,6 +253,7 @@ class RecipeFavorite(models.Model):
         related_name='recipe_favorite',
         verbose_name='Пользователь'
     )
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['id']
@@ -220,6 +275,8 @@ class RecipeFavorite(models.Model):
 class ShoppingCart(models.Model):
     """Рецепты для списка покупок. Связка рецепт-пользователь."""
 
+    counter_field = 'cart_count'
+
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
@@ -232,6 +289,8 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Пользователь'
     )
+    # Пакетные операции обновляют еще и список покупок.
+    objects = ShoppingCartQuerySet.as_manager()
 
     class Meta:
         ordering = ['user']
@@ -248,3 +307,130 @@ class ShoppingCart(models.Model):
         user = self.user
         recipe = self.recipe
         return f'{user} добавил "{recipe}" в корзину'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Строка списка покупок пользователя: суммарное количество ингредиента
+    по рецептам из корзины и число этих рецептов.
+    Обновляется по разнице при изменении корзины и состава рецептов
+    из корзины (см. recipes.shopping_list).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    # Точная сумма: у float копятся остатки вроде 0.20000000000000004.
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        verbose_name='Количество'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов'
+    )
+
+    class Meta:
+        ordering = ['user']
+        verbose_name = 'Список покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_ingredient_in_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient}, {self.amount}'
+
+
+class ImageJob(models.Model):
+    """
+    Задача фоновой обработки картинки рецепта.
+    Хранит base64-строку из запроса, обрабатывается командой
+    'manage.py process_images'.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Рецепт'
+    )
+    payload = models.TextField(verbose_name='Картинка в base64')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана'
+    )
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу'
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Очередь обработки картинок'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.created}'
+
+
+class FeedEntry(models.Model):
+    """
+    Лента рецептов от авторов, на которых подписан пользователь.
+    Заполняется при записи: при публикации рецепта и при подписке.
+    Автор хранится для быстрой очистки ленты при отписке.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        ordering = ['user', '-recipe']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_recipe_in_feed'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
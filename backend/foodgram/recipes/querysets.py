@@ -1,26 +1,63 @@
-from django.db import models
-from django.db.models import BooleanField, Exists, OuterRef, Q, Value
-from users.models import User
+from django.db import models, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch, Q,
+                              Value, Window)
+from django.db.models.functions import RowNumber
+from users.models import Subscription, User
 
 
 class RecipeQuerySet(models.QuerySet):
     """
     Кастомный queryset для модели Recipe.
-    Добавлены поля 'is_favorited' и 'is_in_shopping_cart'.
+    Добавлены поля 'is_favorited', 'is_in_shopping_cart'
+    и 'author_is_subscribed'.
+    Автор, теги и ингредиенты загружаются заранее, поэтому
+    количество запросов не зависит от размера страницы.
     """
 
-    def annotated(self, user):
-        """Ожидает на вход экземпляр модели 'user'."""
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецепта."""
+
+        from .models import RecipeIngredients
+
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def annotated(self, user, with_flags=True):
+        """
+        Ожидает на вход экземпляр модели 'user'.
+        with_flags=False - подзапросы 'is_favorited' и 'is_in_shopping_cart'
+        не добавляются, флаги заполняются по кешу (recipes.membership).
+        """
+
+        queryset = self.with_related()
 
         # Проверяем все возможные ситуации с параметром 'user'.
         if (not isinstance(user, User)
                 or user is None
                 or not user.is_authenticated):
-            return self.annotate(
+            return queryset.annotate(
                 is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField())
             )
-        return self.annotate(
+        subscribed = queryset.annotate(
+            author_is_subscribed=Exists(
+                # Подписан ли юзер на автора рецепта.
+                Subscription.objects.filter(
+                    author=OuterRef('author'),
+                    user=user
+                ))
+        )
+        if not with_flags:
+            return subscribed
+        return subscribed.annotate(
             is_favorited=Exists(
                 self.filter(
                     # Существует ли связка рецепт-любимый рецепт-юзер.
@@ -35,6 +72,59 @@ class RecipeQuerySet(models.QuerySet):
                 ))
         )
 
+    def with_tags(self, tag_ids):
+        """
+        Рецепты хотя бы с одним из тегов 'tag_ids'.
+        Полусоединение через EXISTS по связке рецепт-тег: каждый рецепт
+        возвращается один раз, без DISTINCT, сколько бы тегов ни совпало.
+        """
+
+        from .models import RecipeTags
+
+        if not tag_ids:
+            return self.none()
+        return self.annotate(
+            has_tags=Exists(
+                RecipeTags.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=tag_ids
+                )
+            )
+        ).filter(has_tags=True)
+
+    def top_for_authors(self, author_ids, limit):
+        """
+        Первые 'limit' рецептов каждого автора из 'author_ids' одним запросом.
+        Рецепты нумеруются внутри автора оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author_id), лишние строки
+        отсекаются на стороне БД.
+        Возвращает словарь {'id автора': [рецепты]}.
+        """
+
+        recipes = {author_id: [] for author_id in author_ids}
+        if not recipes or limit <= 0:
+            return recipes
+
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            author_row=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('name').asc(), F('id').asc()]
+            )
+        ).order_by().values(
+            'id', 'name', 'image', 'cooking_time', 'author_id', 'author_row'
+        )
+        sql, params = ranked.query.sql_with_params()
+        raw = self.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            f'WHERE ranked.author_row <= %s '
+            f'ORDER BY ranked.author_id, ranked.author_row',
+            (*params, limit)
+        )
+        for recipe in raw:
+            recipes[recipe.author_id].append(recipe)
+        return recipes
+
 
 class RecipeManager(models.Manager):
     """
@@ -47,5 +137,141 @@ class RecipeManager(models.Manager):
     def get_queryset(self):
         return RecipeQuerySet(self.model, using=self._db)
 
-    def annotated(self, user=None):
-        return self.get_queryset().annotated(user)
+    def annotated(self, user=None, with_flags=True):
+        return self.get_queryset().annotated(user, with_flags)
+
+    def top_for_authors(self, author_ids, limit):
+        return self.get_queryset().top_for_authors(author_ids, limit)
+
+
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Кастомный queryset для связок рецепт-пользователь
+    (избранное, корзина).
+    Пакетные операции идут мимо сигналов, поэтому счетчик у рецептов
+    (поле из атрибута модели 'counter_field') меняется здесь одним UPDATE,
+    а кеш 'membership' пользователя сбрасывается здесь же.
+    """
+
+    def _change_counters(self, recipe_ids, delta):
+        from .models import Recipe
+
+        field = self.model.counter_field
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{field: F(field) + delta}
+        )
+
+    def _rows_changed(self, user_id, recipe_ids, delta):
+        """
+        Последствия пакетного добавления (delta=1) или удаления
+        (delta=-1) рецептов 'recipe_ids' у пользователя.
+        """
+
+        from .membership import invalidate_membership
+
+        self._change_counters(recipe_ids, delta)
+        invalidate_membership(user_id)
+
+    def _delete_rows(self, rows):
+        """
+        Удаляет строки 'rows' одним DELETE, без загрузки объектов
+        и без сигналов. Вызывающий сам делает то, что сделали бы
+        сигналы удаления:
+        counted_object_deleted - счетчик у рецептов (_change_counters),
+        membership_changed - сброс кеша 'membership',
+        cart_item_deleted - пересчет списка покупок (для корзины).
+        Обычный delete() выполнил бы их на каждую строку отдельно.
+        """
+
+        return rows._raw_delete(using=self.db)
+
+    def _lock_user(self, user):
+        """
+        Блокирует строку пользователя до конца транзакции.
+        Пакетные операции одного пользователя идут по очереди,
+        поэтому предварительное чтение строк совпадает с тем,
+        что реально вставлено или удалено, и счетчики не расходятся.
+        """
+
+        list(
+            User.objects.using(self.db).select_for_update().filter(
+                pk=user.pk
+            ).values_list('pk', flat=True)
+        )
+
+    def bulk_add(self, user, recipe_ids):
+        """
+        Добавляет пользователю рецепты из 'recipe_ids' одним INSERT.
+        Возвращает три отсортированных списка id:
+        добавленные, уже добавленные ранее и несуществующие.
+        """
+
+        from .models import Recipe
+
+        recipe_ids = set(recipe_ids)
+        with transaction.atomic(using=self.db):
+            self._lock_user(user)
+            found = dict(
+                Recipe.objects.filter(id__in=recipe_ids).annotate(
+                    is_present=Exists(
+                        self.filter(user=user, recipe=OuterRef('pk'))
+                    )
+                ).order_by().values_list('id', 'is_present')
+            )
+            added = {pk for pk, is_present in found.items() if not is_present}
+            self.bulk_create(
+                [self.model(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True
+            )
+            self._rows_changed(user.id, added, 1)
+        present = set(found) - added
+        return sorted(added), sorted(present), sorted(recipe_ids - set(found))
+
+    def bulk_remove(self, user, recipe_ids):
+        """
+        Удаляет у пользователя рецепты из 'recipe_ids' одним DELETE.
+        Возвращает отсортированные списки id: удаленные и не найденные.
+        """
+
+        recipe_ids = set(recipe_ids)
+        with transaction.atomic(using=self.db):
+            self._lock_user(user)
+            rows = self.filter(user=user, recipe_id__in=recipe_ids)
+            removed = set(
+                rows.order_by().values_list('recipe_id', flat=True)
+            )
+            self._rows_changed(user.id, removed, -1)
+            self._delete_rows(rows)
+        return sorted(removed), sorted(recipe_ids - removed)
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    """
+    Кастомный queryset для модели ShoppingCart.
+    Вместе со счетчиками пакетные операции обновляют список покупок.
+    """
+
+    def _rows_changed(self, user_id, recipe_ids, delta):
+        from .shopping_list import change_shopping_list
+
+        super()._rows_changed(user_id, recipe_ids, delta)
+        change_shopping_list(user_id, recipe_ids, delta)
+
+    def clear(self, user):
+        """
+        Очищает корзину пользователя целиком.
+        Список покупок при этом просто удаляется, без пересчета по разнице.
+        """
+
+        from .membership import invalidate_membership
+        from .models import ShoppingListItem
+
+        with transaction.atomic(using=self.db):
+            self._lock_user(user)
+            rows = self.filter(user=user)
+            self._change_counters(
+                rows.order_by().values_list('recipe_id', flat=True), -1
+            )
+            ShoppingListItem.objects.filter(user=user).delete()
+            invalidate_membership(user.id)
+            return self._delete_rows(rows)
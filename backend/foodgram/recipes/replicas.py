@@ -0,0 +1,102 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_KEY = 'db-pin:{}'
+
+# Реплика, с которой читает текущий запрос; None - основная БД.
+_read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+    """
+    Чтение - с реплики, выбранной для текущего запроса (use_replica),
+    иначе, как и любая запись, - с основной БД.
+    Внутри транзакции на основной БД чтение тоже идет с нее.
+    Миграции применяются только к основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на основной БД.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def use_replica(alias):
+    """
+    Чтение внутри блока идет с 'alias' (None - с основной БД).
+    Вложенный use_replica(None) - принудительное чтение с основной БД.
+    """
+
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def primary():
+    return use_replica(None)
+
+
+def choose_replica(user):
+    """
+    Реплика для чтения в запросе пользователя 'user' или None.
+    Сразу после записи пользователь читает с основной БД,
+    чтобы видеть свои изменения (read-your-writes).
+    """
+
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if user.is_authenticated and cache.get(PIN_KEY.format(user.id)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin_to_primary(user_id):
+    """Чтение пользователя на DB_REPLICA_LAG секунд идет с основной БД."""
+
+    if settings.DATABASE_REPLICAS:
+        cache.set(PIN_KEY.format(user_id), True, settings.DB_REPLICA_LAG)
+
+
+def check_connections(**kwargs):
+    """
+    Проверка постоянных соединений (CONN_MAX_AGE) в начале запроса:
+    соединение, простоявшее дольше DB_HEALTH_CHECK_IDLE секунд,
+    проверяется запросом и закрывается, если сервер его уже разорвал.
+    Django откроет новое при первом обращении.
+    """
+
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        idle = now - getattr(connection, 'last_request_at', now)
+        if (idle >= settings.DB_HEALTH_CHECK_IDLE
+                and not connection.is_usable()):
+            connection.close()
+
+
+def mark_connections(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_request_at = now
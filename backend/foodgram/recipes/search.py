@@ -0,0 +1,78 @@
+from bisect import bisect_left
+
+from django.db import DatabaseError
+
+from .versions import VersionedValue
+
+INGREDIENTS_VERSION = 'recipes.ingredient'
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска: без регистра, 'ё' -> 'е'."""
+
+    return value.lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+    Хранит отсортированный массив нормализованных названий,
+    поиск по префиксу - бинарный. Результаты ранжируются:
+    точные совпадения, затем по префиксу, затем по подстроке.
+    Индекс перестраивается, когда меняется версия 'recipes.ingredient'
+    (ее увеличивают сигналы модели Ingredient).
+    """
+
+    def __init__(self):
+        self._index = VersionedValue(INGREDIENTS_VERSION, self.build)
+
+    def build(self, version):
+        """Нормализованные названия и записи ингредиентов, по порядку."""
+
+        from .models import Ingredient
+
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (normalize(row['name']), row['name'], row['id'])
+        )
+        return (
+            tuple(normalize(row['name']) for row in rows),
+            tuple(rows)
+        )
+
+    def warm(self):
+        """Прогрев индекса при старте воркера."""
+
+        try:
+            self.refresh()
+        except DatabaseError:
+            # Таблицы еще нет (например, до миграций) -
+            # индекс построится при первом поиске.
+            pass
+
+    def refresh(self):
+        """Текущий индекс; перестраивается при смене версии."""
+
+        return self._index.get()
+
+    def search(self, query):
+        keys, entries = self.refresh()
+        query = normalize(query)
+
+        exact, prefix = [], []
+        index = bisect_left(keys, query)
+        while index < len(keys) and keys[index].startswith(query):
+            if keys[index] == query:
+                exact.append(entries[index])
+            else:
+                prefix.append(entries[index])
+            index += 1
+
+        substring = [
+            entry for key, entry in zip(keys, entries)
+            if query in key and not key.startswith(query)
+        ]
+        return exact + prefix + substring
+
+
+ingredient_index = IngredientIndex()
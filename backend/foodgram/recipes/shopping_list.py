@@ -0,0 +1,179 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import (Case, Count, DecimalField, F, IntegerField, Sum,
+                              Value, When)
+
+from .models import RecipeIngredients, ShoppingCart, ShoppingListItem
+
+REBUILD_BATCH_SIZE = 5000
+
+# Точность сумм в списке покупок (ShoppingListItem.amount).
+AMOUNT_STEP = Decimal('0.001')
+
+
+def to_amount(value):
+    """Количество ингредиента (float) как Decimal с точностью списка."""
+
+    return Decimal(value).quantize(AMOUNT_STEP)
+
+
+def apply_delta(user_ids, delta):
+    """
+    Прибавляет к спискам покупок пользователей 'user_ids' одинаковую
+    для всех разницу 'delta' - {id ингредиента: (количество, рецептов)}.
+    Не больше трех запросов: INSERT недостающих строк, один UPDATE
+    с CASE по ингредиентам и DELETE строк без рецептов.
+    """
+
+    delta = {
+        ingredient_id: (to_amount(amount), recipes)
+        for ingredient_id, (amount, recipes) in delta.items()
+    }
+    delta = {
+        ingredient_id: change for ingredient_id, change in delta.items()
+        if change != (0, 0)
+    }
+    if not user_ids or not delta:
+        return
+
+    added = [
+        ingredient_id for ingredient_id, (_, recipes) in delta.items()
+        if recipes > 0
+    ]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids for ingredient_id in added
+            ],
+            ignore_conflicts=True
+        )
+
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=delta
+    )
+    items.update(
+        amount=F('amount') + Case(
+            *[When(ingredient_id=ingredient_id, then=Value(amount))
+              for ingredient_id, (amount, _) in delta.items()],
+            default=Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=3)
+        ),
+        recipes_count=F('recipes_count') + Case(
+            *[When(ingredient_id=ingredient_id, then=Value(recipes))
+              for ingredient_id, (_, recipes) in delta.items()],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+    if any(recipes < 0 for _, recipes in delta.values()):
+        items.filter(recipes_count=0).delete()
+
+
+def change_shopping_list(user_id, recipe_ids, sign):
+    """
+    Рецепты 'recipe_ids' добавлены в корзину пользователя (sign=1)
+    или удалены из нее (sign=-1).
+    Состав рецептов суммируется по ингредиентам одним запросом.
+    """
+
+    if not recipe_ids:
+        return
+    totals = RecipeIngredients.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by().values('ingredient_id').annotate(
+        total=Sum('amount'),
+        recipes=Count('id')
+    )
+    apply_delta([user_id], {
+        row['ingredient_id']: (sign * row['total'], sign * row['recipes'])
+        for row in totals
+    })
+
+
+def get_recipe_amounts(recipe_ids):
+    """{id рецепта: {id ингредиента: количество}} одним запросом."""
+
+    amounts = {recipe_id: {} for recipe_id in recipe_ids}
+    rows = RecipeIngredients.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id', 'amount')
+    for recipe_id, ingredient_id, amount in rows:
+        amounts[recipe_id][ingredient_id] = amount
+    return amounts
+
+
+def get_amounts_delta(old, new):
+    """Разница составов рецепта в формате apply_delta()."""
+
+    delta = {}
+    for ingredient_id in old.keys() | new.keys():
+        recipes = (ingredient_id in new) - (ingredient_id in old)
+        amount = new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        delta[ingredient_id] = (amount, recipes)
+    return delta
+
+
+@contextmanager
+def track_recipe_ingredients(recipe_ids):
+    """
+    Контекст для изменения состава рецептов 'recipe_ids'.
+    Запоминает состав до изменения и после выхода переносит разницу
+    в списки покупок всех, у кого эти рецепты в корзине.
+    """
+
+    recipe_ids = set(recipe_ids)
+    old_amounts = get_recipe_amounts(recipe_ids)
+    yield
+    new_amounts = get_recipe_amounts(recipe_ids)
+    changed = [
+        recipe_id for recipe_id in recipe_ids
+        if old_amounts[recipe_id] != new_amounts[recipe_id]
+    ]
+    if not changed:
+        return
+
+    user_ids = defaultdict(list)
+    carts = ShoppingCart.objects.filter(
+        recipe_id__in=changed
+    ).order_by().values_list('recipe_id', 'user_id')
+    for recipe_id, user_id in carts:
+        user_ids[recipe_id].append(user_id)
+    for recipe_id in changed:
+        apply_delta(
+            user_ids[recipe_id],
+            get_amounts_delta(old_amounts[recipe_id], new_amounts[recipe_id])
+        )
+
+
+def rebuild_shopping_lists():
+    """Пересобирает все списки покупок по корзинам."""
+
+    ShoppingListItem.objects.all().delete()
+    totals = RecipeIngredients.objects.filter(
+        recipe__in_shopping_cart__isnull=False
+    ).order_by().values(
+        'ingredient_id',
+        user_id=F('recipe__in_shopping_cart__user_id')
+    ).annotate(
+        total=Sum('amount'),
+        recipes=Count('id')
+    )
+    items = (
+        ShoppingListItem(
+            user_id=row['user_id'],
+            ingredient_id=row['ingredient_id'],
+            amount=to_amount(row['total']),
+            recipes_count=row['recipes']
+        )
+        for row in totals.iterator()
+    )
+    # Пачками: на пачки под лимиты БД bulk_create делит сам.
+    batch = list(islice(items, REBUILD_BATCH_SIZE))
+    while batch:
+        ShoppingListItem.objects.bulk_create(batch)
+        batch = list(islice(items, REBUILD_BATCH_SIZE))
@@ -0,0 +1,126 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import Subscription, User
+from .counters import change_counter
+from .feed import add_author_to_feed, fan_out_recipe, remove_author_from_feed
+from .membership import invalidate_membership
+from .shopping_list import change_shopping_list
+from .models import (Ingredient, Recipe, RecipeFavorite, RecipeIngredients,
+                     RecipeTags, ShoppingCart, Tag)
+from .versions import RECIPES_VERSION, bump_version_on_commit
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reference_data_changed(sender, **kwargs):
+    """
+    Любое изменение справочных данных увеличивает их версию:
+    снимки списков и индекс поиска ингредиентов становятся устаревшими.
+    """
+
+    bump_version_on_commit(sender._meta.label_lower)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+@receiver(post_save, sender=RecipeTags)
+@receiver(post_delete, sender=RecipeTags)
+@receiver(m2m_changed, sender=RecipeTags)
+def recipes_changed(**kwargs):
+    """Рецепты изменились - закешированные ответы API устарели."""
+
+    bump_version_on_commit(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def author_changed(update_fields=None, **kwargs):
+    """
+    Данные автора выводятся в рецептах.
+    Обновление одного 'last_login' при входе на рецепты не влияет.
+    """
+
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version_on_commit(RECIPES_VERSION)
+
+
+# Денормализованные счетчики: (модель-владелец счетчика, поле FK, счетчик).
+COUNTERS = {
+    RecipeFavorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'cart_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Subscription: (User, 'author_id', 'subscribers_count'),
+}
+
+
+@receiver(post_save, sender=RecipeFavorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscription)
+def counted_object_created(sender, instance, created, **kwargs):
+    if created:
+        model, field, counter = COUNTERS[sender]
+        change_counter(model, getattr(instance, field), counter, 1)
+
+
+@receiver(post_delete, sender=RecipeFavorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscription)
+def counted_object_deleted(sender, instance, **kwargs):
+    model, field, counter = COUNTERS[sender]
+    change_counter(model, getattr(instance, field), counter, -1)
+
+
+@receiver(post_save, sender=RecipeFavorite)
+@receiver(post_delete, sender=RecipeFavorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def membership_changed(instance, **kwargs):
+    """
+    Избранное или корзина изменились - кеш id рецептов пользователя
+    устарел. Срабатывает и для AddToFavOrShopCartCommonView,
+    и для админки, и для каскадного удаления рецепта.
+    """
+
+    invalidate_membership(instance.user_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_item_created(instance, created, **kwargs):
+    if created:
+        change_shopping_list(instance.user_id, [instance.recipe_id], 1)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_item_deleted(instance, **kwargs):
+    """
+    pre_delete: при каскадном удалении рецепта его ингредиенты
+    могут быть удалены раньше строки корзины.
+    """
+
+    change_shopping_list(instance.user_id, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(instance, **kwargs):
+    remove_author_from_feed(instance.user, instance.author)
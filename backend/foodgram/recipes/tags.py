@@ -0,0 +1,23 @@
+from .versions import VersionedValue
+
+TAGS_VERSION = 'recipes.tag'
+
+
+def load_slug_map(version):
+    from .models import Tag
+
+    return dict(Tag.objects.values_list('slug', 'id'))
+
+
+_slug_map = VersionedValue(TAGS_VERSION, load_slug_map)
+
+
+def get_tag_ids(slugs):
+    """
+    Переводит слаги тегов в id по карте в памяти процесса.
+    Карта перечитывается из БД только при смене версии тегов.
+    Неизвестные слаги пропускаются.
+    """
+
+    ids = _slug_map.get()
+    return [ids[slug] for slug in slugs if slug in ids]
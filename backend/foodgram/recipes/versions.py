@@ -0,0 +1,103 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .replicas import primary
+
+# Рецепты вместе с ингредиентами, тегами и авторами.
+RECIPES_VERSION = 'recipes.recipe'
+
+VERSION_KEY = 'version:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных 'name' (обычно - метка модели,
+    например 'recipes.ingredient').
+    Версия хранится в кеше и общая для всех воркеров, если кеш общий.
+    Начальное значение берется из времени, чтобы после очистки
+    кеша версия не совпала с одной из прежних.
+    """
+
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Увеличивает версию набора данных 'name' после его изменения."""
+
+    key = VERSION_KEY.format(name)
+    cache.set(MODIFIED_KEY.format(name), int(time.time()), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа в кеше нет - задаем новую версию.
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def bump_version_on_commit(name):
+    """
+    Увеличивает версию после коммита текущей транзакции:
+    иначе параллельный запрос успеет собрать данные до коммита
+    и сохранить их под новой версией.
+    """
+
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def get_last_modified(name):
+    """Время последнего изменения набора данных 'name' (timestamp)."""
+
+    key = MODIFIED_KEY.format(name)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), timeout=None)
+        modified = cache.get(key)
+    return modified
+
+
+class VersionedValue:
+    """
+    Значение в памяти процесса (карта, индекс, снимок), собранное
+    из набора данных 'name' и пересобираемое при смене его версии.
+    'build' получает версию и возвращает новое значение.
+
+    Пересборка идет под блокировкой, чтобы потоки воркера не собирали
+    одно и то же параллельно, и читает с основной БД: значение живет
+    до следующей смены версии, и данные с отстающей реплики остались
+    бы в памяти до нее.
+    Версия и значение подменяются одной парой - читатели в других
+    потоках всегда видят согласованные данные.
+    """
+
+    def __init__(self, name, build=None):
+        self.name = name
+        self.build = build
+        self._state = (None, None)
+        self._lock = threading.Lock()
+
+    def get(self, build=None):
+        """
+        Текущее значение. 'build' можно передать при вызове
+        вместо заданной в конструкторе.
+        """
+
+        version = get_version(self.name)
+        current, value = self._state
+        if current == version:
+            return value
+        with self._lock, primary():
+            current, value = self._state
+            if current != version:
+                value = (build or self.build)(version)
+                self._state = (version, value)
+        return value
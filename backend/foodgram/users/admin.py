@@ -8,5 +8,11 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('username', 'email')
 
 
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+
+
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(Subscription)
+admin.site.register(Subscription, SubscriptionAdmin)
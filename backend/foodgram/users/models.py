@@ -7,6 +7,7 @@ class User(AbstractUser):
     """
     Пользовательская модель юзера с переопределенными полями.
     Для авторизации используется e-mail вместо username.
+    Счетчики рецептов и подписчиков обновляются сигналами.
     """
 
     email = models.EmailField(
@@ -14,6 +15,16 @@ class User(AbstractUser):
         unique=True
     )
     first_name = models.CharField(max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 